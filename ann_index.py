@@ -0,0 +1,195 @@
+import math
+from typing import Iterable, Optional
+
+import faiss
+import numpy as np
+
+# Tipos de índice soportados por RAGSystem
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Codificación de los vectores: float32 exacto, escalar de 8 bits (4x menos memoria)
+# o product quantization (pq_m bytes por vector: 48 para 384 dimensiones, 32x menos)
+VECTOR_ENCODINGS = ("float32", "sq8", "pq")
+
+# PQ de 8 bits entrena 256 centroides por subvector; k-means de faiss pide 39 puntos por centroide
+PQ_TRAINING_SIZE = 256 * 39
+
+# Vectores mínimos para entrenar el índice plano cuantizado: el rango por dimensión
+# de sq8 se estima bien con pocos
+COMPACT_TRAINING_SIZE = {"sq8": 1000, "pq": PQ_TRAINING_SIZE}
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Número de listas IVF recomendado para n vectores (~4·√n)."""
+    return max(1, min(65536, int(4 * math.sqrt(n_vectors))))
+
+
+def min_training_size(index_type: str, n_vectors: int, nlist: Optional[int] = None,
+                      encoding: str = "float32") -> int:
+    """
+    Vectores necesarios para entrenar el índice: al menos un punto por lista
+    IVF y, con product quantization, PQ_TRAINING_SIZE para sus codebooks.
+    """
+    if index_type == "flat":
+        return COMPACT_TRAINING_SIZE.get(encoding, 0)
+    pq = index_type == "ivf_pq" or encoding == "pq"
+    if index_type == "hnsw":
+        return PQ_TRAINING_SIZE if pq else 0
+    nlist = nlist or default_nlist(n_vectors)
+    return max(nlist, PQ_TRAINING_SIZE) if pq else nlist
+
+
+def build_ann_index(vectors: np.ndarray, index_type: str, nlist: Optional[int] = None,
+                    hnsw_m: int = 32, pq_m: Optional[int] = None, seed: int = 1234,
+                    encoding: str = "float32") -> faiss.Index:
+    """
+    Construye, entrena y llena un índice aproximado con vectores float32.
+
+    ivf_flat: listas invertidas; los vectores se guardan con la codificación dada.
+    hnsw: grafo HNSW; con float32 no requiere entrenamiento.
+    ivf_pq: listas invertidas con product quantization (pq_m subvectores de 8 bits).
+    """
+    if index_type not in INDEX_TYPES or index_type == "flat":
+        raise ValueError(f"Tipo de índice aproximado no soportado: {index_type}")
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    pq_m = pq_m or _default_pq_m(dim)
+
+    if index_type == "hnsw":
+        if encoding == "sq8":
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, hnsw_m)
+        elif encoding == "pq":
+            index = faiss.IndexHNSWPQ(dim, pq_m, hnsw_m)
+        else:
+            index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        if not index.is_trained:
+            index.train(_training_sample(vectors, 10000, seed))
+        index.add(vectors)
+        return index
+
+    nlist = nlist or default_nlist(n)
+    if index_type == "ivf_pq":
+        encoding = "pq"
+    index = faiss.index_factory(dim, f"IVF{nlist},{_codec(encoding, pq_m)}")
+    if encoding == "pq":
+        # index_factory activa el entrenamiento polisémico, muy lento y sin uso aquí
+        index.do_polysemous_training = False
+
+    # Entrenar con una muestra: k-means no mejora apreciablemente pasado ~256 puntos por lista
+    index.train(_training_sample(vectors, max(nlist * 256, 10000), seed))
+
+    # El mapa directo permite reconstruir vectores al eliminar o reconstruir el índice
+    faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Array)
+    index.add(vectors)
+    return index
+
+
+def build_compact_index(vectors: np.ndarray, encoding: str, pq_m: Optional[int] = None,
+                        seed: int = 1234) -> faiss.Index:
+    """
+    Índice de búsqueda exhaustiva como IndexFlat, pero con los vectores
+    cuantizados (sq8 o pq): misma búsqueda por fuerza bruta sobre códigos
+    más pequeños. Admite eliminar filas como IndexFlat.
+    """
+    if encoding not in VECTOR_ENCODINGS or encoding == "float32":
+        raise ValueError(f"Codificación compacta no soportada: {encoding}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    index = faiss.index_factory(dim, _codec(encoding, pq_m or _default_pq_m(dim)))
+    if encoding == "pq":
+        index.do_polysemous_training = False
+    index.train(_training_sample(vectors, COMPACT_TRAINING_SIZE["pq"] * 2, seed))
+    index.add(vectors)
+    return index
+
+
+def is_quantized(index: faiss.Index) -> bool:
+    """El índice guarda códigos aproximados en lugar de los vectores float32."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return not isinstance(index, (faiss.IndexFlat, faiss.IndexIVFFlat))
+
+
+def bytes_per_vector(index: faiss.Index) -> int:
+    """Memoria aproximada de cada vector en el índice, incluidas las estructuras de búsqueda."""
+    if isinstance(index, faiss.IndexHNSW):
+        # Código del vector más los enlaces del nivel 0 (2·M vecinos de 4 bytes)
+        return faiss.downcast_index(index.storage).sa_code_size() + index.hnsw.nb_neighbors(0) * 4
+    if isinstance(index, faiss.IndexIVF):
+        # Código más el id de 8 bytes en la lista invertida y en el mapa directo
+        return index.code_size + 16
+    return getattr(index, "code_size", index.d * 4)
+
+
+def calibrate_distance_offset(index: faiss.Index, vectors: np.ndarray, queries: int = 200,
+                              k: int = 8, seed: int = 1234) -> float:
+    """
+    Diferencia media entre la distancia L2 que informa un índice cuantizado y
+    la exacta, en los k primeros resultados de consultas tomadas del corpus.
+
+    Permite expresar los umbrales de confianza (pensados para distancias
+    exactas) en la escala del índice. Se excluye el propio vector de cada
+    consulta, cuya distancia exacta es 0 y no representa una consulta real.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), min(queries, len(vectors)), replace=False)
+    distances, indices = index.search(vectors[rows], k + 1)
+    valid = (indices >= 0) & (indices != rows[:, None])
+    if not valid.any():
+        return 0.0
+    exact = np.sum((vectors[rows][:, None, :] - vectors[np.maximum(indices, 0)]) ** 2, axis=2)
+    return float(np.mean((distances - exact)[valid]))
+
+
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      exclude: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Parámetros de búsqueda por consulta; no modifican el índice compartido entre hilos.
+
+    exclude descarta filas durante la búsqueda (ver deleted_rows_selector).
+    """
+    selector = {"sel": exclude} if exclude is not None else {}
+    if isinstance(index, faiss.IndexIVF) and (nprobe or selector):
+        return faiss.SearchParametersIVF(nprobe=nprobe or index.nprobe, **selector)
+    if isinstance(index, faiss.IndexHNSW) and (ef_search or selector):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or index.hnsw.efSearch, **selector)
+    return None
+
+
+def deleted_rows_selector(rows: Iterable[int]) -> Optional[faiss.IDSelector]:
+    """
+    Selector que excluye filas eliminadas de un índice aproximado, o None si no hay.
+
+    IVF no renumera las filas al eliminar y HNSW no permite eliminar: las filas
+    quedan en el índice y la búsqueda las salta hasta la siguiente reconstrucción.
+    """
+    rows = np.fromiter(rows, dtype=np.int64)
+    if not len(rows):
+        return None
+    deleted = faiss.IDSelectorBatch(rows)
+    selector = faiss.IDSelectorNot(deleted)
+    # SWIG no retiene el selector interno
+    selector.referenced_objects = [deleted]
+    return selector
+
+
+def _codec(encoding: str, pq_m: int) -> str:
+    """Descripción de index_factory para guardar los vectores con la codificación dada."""
+    return {"float32": "Flat", "sq8": "SQ8", "pq": f"PQ{pq_m}x8"}[encoding]
+
+
+def _training_sample(vectors: np.ndarray, size: int, seed: int) -> np.ndarray:
+    n = len(vectors)
+    if size >= n:
+        return vectors
+    return vectors[np.random.default_rng(seed).choice(n, size, replace=False)]
+
+
+def _default_pq_m(dim: int) -> int:
+    """Mayor número de subvectores ≤ dim/8 que divide la dimensión (48 para 384)."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
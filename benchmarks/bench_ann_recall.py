@@ -0,0 +1,102 @@
+"""
+Recall@k y latencia de los índices aproximados (IVF-Flat, HNSW, IVF-PQ) frente
+al índice plano exacto, sobre un corpus sintético de vectores agrupados con la
+dimensión de MiniLM (384). No usa ningún modelo de embeddings: corre sin red.
+El tamaño por defecto sirve para CI; para medir a escala, --chunks 1000000.
+
+Uso:
+    python benchmarks/bench_ann_recall.py --chunks 20000 --queries 200
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from common import percentiles
+from ann_index import build_ann_index, search_parameters
+
+SWEEPS = {
+    "ivf_flat": [("nprobe", v) for v in (1, 4, 16, 64)],
+    "ivf_pq": [("nprobe", v) for v in (1, 4, 16, 64)],
+    "hnsw": [("ef_search", v) for v in (16, 32, 64, 128)],
+}
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Vectores normalizados alrededor de centros aleatorios, similar a embeddings de temas."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        end = min(n, start + 100000)
+        labels = rng.integers(0, clusters, end - start)
+        vectors[start:end] = centers[labels] + 0.6 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def measure(index, queries: np.ndarray, k: int, params=None):
+    samples, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        if params is None:
+            _, ids = index.search(query[None, :], k)
+        else:
+            _, ids = index.search(query[None, :], k, params=params)
+        samples.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return np.array(results), percentiles(samples)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return round(hits / truth.size, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(SWEEPS))
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.chunks, args.dim, clusters=max(16, args.chunks // 2000), seed=0)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.chunks, args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+
+    flat = faiss.IndexFlatL2(args.dim)
+    flat.add(vectors)
+    truth, flat_latency = measure(flat, queries, args.k)
+    results = [{"index": "flat", "recall": 1.0, "latency": flat_latency}]
+    print(json.dumps(results[-1]))
+
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_ann_index(vectors, index_type)
+        build_seconds = round(time.perf_counter() - start, 2)
+        for name, value in SWEEPS[index_type]:
+            params = search_parameters(index, **{name: value})
+            found, latency = measure(index, queries, args.k, params)
+            results.append({
+                "index": index_type,
+                name: value,
+                "build_seconds": build_seconds,
+                "recall": recall_at_k(found, truth),
+                "latency": latency
+            })
+            print(json.dumps(results[-1]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": args.chunks, "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
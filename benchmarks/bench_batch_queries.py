@@ -0,0 +1,68 @@
+"""
+Rendimiento de RAGSystem.query_batch frente a llamar a query pregunta por
+pregunta, con la caché de respuestas desactivada. Verifica que ambas rutas
+devuelven exactamente lo mismo.
+
+La mayor parte de la ganancia viene de embeber las preguntas en un solo
+lote: con un modelo real en CPU el lote domina; FAISS y el post-proceso por
+pregunta son iguales en ambas rutas. Con --stub-embeddings no se carga
+ningún modelo y la corrida no necesita red.
+
+Uso:
+    python benchmarks/bench_batch_queries.py --articles 5000 --questions 1000 --stub-embeddings
+"""
+import argparse
+import json
+import time
+
+from common import PREGUNTAS, StubEmbeddings, synthetic_legal_text
+from rag_system import RAGSystem
+
+
+def make_questions(n: int) -> list:
+    """Preguntas distintas entre sí para que ninguna se resuelva por caché."""
+    return [f"{PREGUNTAS[i % len(PREGUNTAS)]} Artículo {i + 1}" for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="Embeddings deterministas por hashing en lugar de MiniLM")
+    args = parser.parse_args()
+
+    rag = RAGSystem(api_key="benchmark", cache_size=0,
+                    embeddings=StubEmbeddings() if args.stub_embeddings else None)
+    rag.add_documents([synthetic_legal_text(args.articles)], [{"filename": "sintetico.txt"}])
+    questions = make_questions(args.questions)
+
+    # Calentamiento del modelo antes de medir
+    rag.query_batch(questions[:8])
+
+    start = time.perf_counter()
+    sequential = [rag.query(question) for question in questions]
+    sequential_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = rag.query_batch(questions, batch_size=args.batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    assert sequential == batched, "query_batch devolvió resultados distintos a query"
+
+    result = {
+        "questions": args.questions,
+        "sequential_qps": round(args.questions / sequential_seconds, 1),
+        "batch_qps": round(args.questions / batch_seconds, 1),
+        "speedup": round(sequential_seconds / batch_seconds, 2)
+    }
+    print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Rendimiento de los backends de embeddings en CPU (PyTorch, ONNX Runtime y ONNX
+int8) sobre chunks de un corpus legal sintético: chunks por segundo al
+embeber documentos, latencia de embed_query y similitud coseno de cada
+backend con los vectores de PyTorch.
+
+El modelo ONNX se exporta una vez a --onnx-dir (ver COMMANDS.md); la versión
+int8 se mide si existe model_int8.onnx en ese directorio.
+
+Uso:
+    python benchmarks/bench_embedding_backends.py --chunks 2000 --batch-sizes 16 32 64 --output embeddings.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from common import PREGUNTAS, percentiles, synthetic_legal_text
+from embedding_models import LazyEmbeddings
+from rag_system import RAGSystem
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def corpus_chunks(chunks: int, seed: int) -> list:
+    texts = []
+    while len(texts) < chunks:
+        text = synthetic_legal_text(400, seed=seed * 1000003 + len(texts))
+        texts.extend(doc.page_content for doc in RAGSystem.split_stream([(None, text)], {"filename": "ley.txt"}))
+    return texts[:chunks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32])
+    parser.add_argument("--threads", type=int, default=0, help="Hilos de cómputo (0: los del runtime)")
+    parser.add_argument("--onnx-dir", default="onnx_model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    texts = corpus_chunks(args.chunks, args.seed)
+    questions = [f"{PREGUNTAS[i % len(PREGUNTAS)]} Artículo {i + 1}" for i in range(args.queries)]
+
+    backends = [("torch", "model.onnx")]
+    for onnx_file in ("model.onnx", "model_int8.onnx"):
+        if os.path.exists(os.path.join(args.onnx_dir, onnx_file)):
+            backends.append(("onnx", onnx_file))
+
+    results = []
+    reference = None
+    for backend, onnx_file in backends:
+        for batch_size in args.batch_sizes:
+            embeddings = LazyEmbeddings(MODEL, backend=backend, batch_size=batch_size,
+                                        threads=args.threads or None, onnx_dir=args.onnx_dir,
+                                        onnx_file=onnx_file)
+            start = time.perf_counter()
+            embeddings.embed_documents(["calentamiento del modelo de embeddings"])
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            embed_seconds = time.perf_counter() - start
+
+            samples = []
+            for question in questions:
+                start = time.perf_counter()
+                embeddings.embed_query(question)
+                samples.append(time.perf_counter() - start)
+
+            if reference is None:
+                reference = vectors
+            cosine = np.sum(vectors * reference, axis=1) / (
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+            )
+            result = {
+                "backend": embeddings.model_id,
+                "batch_size": batch_size,
+                "threads": args.threads or None,
+                "load_seconds": round(load_seconds, 2),
+                "chunks_per_second": round(len(texts) / embed_seconds, 1),
+                "query_latency": percentiles(samples),
+                "cosine_vs_torch_mean": round(float(cosine.mean()), 5),
+                "cosine_vs_torch_min": round(float(cosine.min()), 5)
+            }
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(texts), "model": MODEL, "cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
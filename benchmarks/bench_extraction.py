@@ -0,0 +1,88 @@
+"""
+Memoria pico y tiempo de extracción + división en chunks de un PDF y un DOCX
+sintéticos grandes: extracción con concatenación y división del texto completo
+(anterior) frente a extracción por páginas/párrafos con división en streaming.
+
+Uso:
+    python benchmarks/bench_extraction.py --pages 3000 --articles 20000
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import synthetic_docx, synthetic_pdf
+from ingestion import extract_chunks
+from pypdf import PdfReader
+import docx
+
+from rag_system import DocumentProcessor, RAGSystem
+
+
+def legacy_extract_chunks(file_path: str, filename: str):
+    """Extracción anterior: texto completo con += y división de una sola vez."""
+    text = ""
+    if filename.endswith(".pdf"):
+        for page in PdfReader(file_path).pages:
+            text += page.extract_text() + "\n"
+    else:
+        for paragraph in docx.Document(file_path).paragraphs:
+            text += paragraph.text + "\n"
+    return RAGSystem.content_hash(text), RAGSystem.split_documents([text], [{"filename": filename}]), {}
+
+
+def streaming_count(file_path: str, filename: str):
+    """Extracción en streaming consumiendo los chunks sin retenerlos (cota del extractor)."""
+    segments = DocumentProcessor.iter_document(file_path, filename)
+    count = sum(1 for _ in RAGSystem.split_stream(segments, {"filename": filename}))
+    return "-" * 12, range(count), {}
+
+
+def measure(function, file_path: str, filename: str) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    content_hash, chunks, _ = function(file_path, filename)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(seconds, 2),
+        "peak_mb": round(peak / 2 ** 20, 1),
+        "chunks": len(chunks),
+        "content_hash": content_hash[:12]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=3000, help="Páginas del PDF sintético")
+    parser.add_argument("--articles", type=int, default=20000, help="Artículos del DOCX sintético")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        files = [
+            (Path(tmp) / "gaceta.pdf", lambda path: synthetic_pdf(str(path), args.pages)),
+            (Path(tmp) / "codigo.docx", lambda path: synthetic_docx(str(path), args.articles)),
+        ]
+        for path, generate in files:
+            generate(path)
+            size_mb = round(path.stat().st_size / 2 ** 20, 1)
+            modes = (("legacy", legacy_extract_chunks), ("streaming", extract_chunks),
+                     ("streaming_no_retain", streaming_count))
+            for mode, function in modes:
+                result = {"file": path.name, "size_mb": size_mb, "mode": mode,
+                          **measure(function, str(path), path.name)}
+                results.append(result)
+                print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Ingiere documentos uno a uno y compara memoria y tiempo entre la ruta anterior
+(un store desechable por carga + merge_from) y la adición en el lugar de
+RAGSystem.add_chunks (add_embeddings sobre el índice existente). Cada modo
+corre en su propio proceso para que el pico de memoria residente (ru_maxrss)
+sea comparable.
+
+Los chunks se dividen y se embeben antes de medir, así solo se comparan las
+rutas de FAISS: el embedding, la caché de embeddings y el índice BM25 cuestan
+lo mismo en ambas. Con --stub-embeddings no se carga ningún modelo y la
+corrida no necesita red.
+
+Uso:
+    python benchmarks/bench_incremental_add.py --documents 100 --articles 60 --stub-embeddings
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from common import StubEmbeddings, synthetic_legal_text
+from langchain_community.vectorstores import FAISS
+from rag_system import RAGSystem
+
+
+def prepare(rag: RAGSystem, documents: int, articles: int) -> list:
+    """(textos y vectores, metadatos, ids) de los chunks de cada documento."""
+    batches = []
+    for i in range(documents):
+        chunks = rag.split_documents([synthetic_legal_text(articles, seed=i)], [{"filename": f"ley_{i}.txt"}])
+        vectors = rag.embeddings.embed_documents([doc.page_content for doc in chunks])
+        batches.append((
+            [(doc.page_content, vector) for doc, vector in zip(chunks, vectors)],
+            [doc.metadata for doc in chunks],
+            [RAGSystem._chunk_id(doc) for doc in chunks]
+        ))
+    return batches
+
+
+def run_mode(mode: str, documents: int, articles: int, stub_embeddings: bool = False) -> dict:
+    rag = RAGSystem(api_key="benchmark", embeddings=StubEmbeddings() if stub_embeddings else None)
+    batches = prepare(rag, documents, articles)
+
+    store = None
+    tracemalloc.start()
+    start = time.perf_counter()
+    for text_embeddings, metadatas, ids in batches:
+        if store is None:
+            store = FAISS.from_embeddings(text_embeddings, rag.embeddings, metadatas=metadatas, ids=ids)
+        elif mode == "legacy":
+            # Ruta anterior: construir un store desechable y fusionarlo
+            store.merge_from(FAISS.from_embeddings(text_embeddings, rag.embeddings, metadatas=metadatas, ids=ids))
+        else:
+            store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "chunks": store.index.ntotal,
+        "seconds": round(elapsed, 3),
+        "python_peak_mb": round(peak / 2**20, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--articles", type=int, default=60)
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="Embeddings deterministas por hashing en lugar de MiniLM")
+    parser.add_argument("--mode", choices=["legacy", "incremental"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.documents, args.articles, args.stub_embeddings)))
+        return
+
+    for mode in ("legacy", "incremental"):
+        command = [sys.executable, __file__, "--mode", mode,
+                   "--documents", str(args.documents), "--articles", str(args.articles)]
+        if args.stub_embeddings:
+            command.append("--stub-embeddings")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        print(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
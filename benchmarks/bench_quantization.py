@@ -0,0 +1,148 @@
+"""
+Modo compacto de vectores (VECTOR_ENCODING sq8 / pq, con y sin rescore) frente
+al índice float32: memoria por vector, recall@k de la búsqueda vectorial,
+latencia de búsqueda y de consulta completa, y coincidencia del nivel de
+confianza, sobre un corpus legal sintético.
+
+Todas las configuraciones indexan los mismos chunks; los embeddings se calculan
+una vez y se reutilizan desde una caché en disco temporal, que también es la
+fuente de los vectores exactos del rescore. Con --stub-embeddings no se carga
+ningún modelo.
+
+Uso:
+    python benchmarks/bench_quantization.py --chunks 20000 --queries 200 --output cuantizacion.json
+"""
+import argparse
+import json
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from common import PREGUNTAS, StubEmbeddings, percentiles, synthetic_legal_text
+from embedding_cache import EmbeddingCache
+from rag_system import RAGSystem
+
+# (codificación, rescore); la primera es la referencia
+CONFIGS = [("float32", False), ("sq8", True), ("sq8", False), ("pq", True), ("pq", False)]
+
+
+def build_corpus(chunks: int, articles_per_document: int, seed: int) -> List[tuple]:
+    """Documentos sintéticos ya divididos hasta llegar a chunks: (entrada del registro, chunks)."""
+    documents = []
+    total = 0
+    while total < chunks:
+        filename = f"ley_{len(documents):05d}.txt"
+        text = synthetic_legal_text(articles_per_document, seed=seed * 1000003 + len(documents))
+        docs = list(RAGSystem.split_stream([(None, text)], {"filename": filename}))
+        entry = RAGSystem.document_entry(filename, docs, RAGSystem.content_hash(text))
+        documents.append((entry, docs))
+        total += len(docs)
+    return documents
+
+
+def build_rag(documents: List[tuple], embeddings, cache: EmbeddingCache, args, encoding: str,
+              rescore: bool) -> tuple:
+    rag = RAGSystem(
+        api_key="benchmark",
+        cache_size=0,
+        index_type=args.index_type,
+        ann_threshold=args.ann_threshold,
+        embeddings=embeddings,
+        embedding_cache=cache,
+        vector_encoding=encoding,
+        rescore=rescore
+    )
+    start = time.perf_counter()
+    for entry, docs in documents:
+        rag.add_chunks(docs, [entry])
+    return rag, time.perf_counter() - start
+
+
+def chunk_ids(results: List[List[tuple]]) -> List[set]:
+    return [{doc.metadata["chunk_hash"] for doc, _ in docs} for docs in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000,
+                        help="Chunks del corpus (pq se entrena a partir de 10000)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--articles-per-document", type=int, default=400)
+    parser.add_argument("--index-type", default="flat", help="FAISS_INDEX_TYPE del sistema medido")
+    parser.add_argument("--ann-threshold", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="Embeddings deterministas por hashing en lugar de MiniLM")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    if args.stub_embeddings:
+        embeddings = StubEmbeddings()
+    else:
+        from embedding_models import LazyEmbeddings
+        embeddings = LazyEmbeddings("sentence-transformers/all-MiniLM-L6-v2")
+
+    documents = build_corpus(args.chunks, args.articles_per_document, args.seed)
+    questions = [f"{PREGUNTAS[i % len(PREGUNTAS)]} Artículo {i + 1}" for i in range(args.queries)]
+    query_vectors = embeddings.embed_documents(questions)
+    k = RAGSystem.retrieval_k
+
+    results = []
+    baseline = None
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(cache_dir, "benchmark")
+        for encoding, rescore in CONFIGS:
+            rag, build_seconds = build_rag(documents, embeddings, cache, args, encoding, rescore)
+            stats = rag.index_stats()
+
+            search_samples, found = [], []
+            for vector in query_vectors:
+                start = time.perf_counter()
+                found.extend(rag._search_by_vectors([vector], k))
+                search_samples.append(time.perf_counter() - start)
+
+            query_samples, confidences = [], []
+            for question in questions:
+                start = time.perf_counter()
+                confidences.append(rag.query(question)["confidence"])
+                query_samples.append(time.perf_counter() - start)
+
+            result = {
+                "encoding": encoding,
+                "rescore": stats["rescore"],
+                "faiss_index": stats["faiss_index"],
+                "chunks": stats["chunks"],
+                "build_seconds": round(build_seconds, 2),
+                "bytes_per_vector": stats["bytes_per_vector"],
+                "vector_memory_mb": round(stats["chunks"] * stats["bytes_per_vector"] / 2 ** 20, 2),
+                "distance_offset": round(rag._distance_offset, 5),
+                "vector_search_latency": percentiles(search_samples),
+                "query_latency": percentiles(query_samples),
+            }
+            if baseline is None:
+                baseline = {"ids": chunk_ids(found), "confidences": confidences, "bytes": stats["bytes_per_vector"]}
+            hits = sum(len(a & b) for a, b in zip(chunk_ids(found), baseline["ids"]))
+            result["recall_at_k"] = round(hits / sum(len(ids) for ids in baseline["ids"]), 4)
+            result["memory_reduction"] = round(baseline["bytes"] / stats["bytes_per_vector"], 1)
+            result["confidence_agreement"] = round(
+                float(np.mean([a == b for a, b in zip(confidences, baseline["confidences"])])), 4
+            )
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "chunks": args.chunks,
+                "queries": args.queries,
+                "k": k,
+                "index_type": args.index_type,
+                "embeddings": "stub" if args.stub_embeddings else "sentence-transformers/all-MiniLM-L6-v2",
+                "results": results
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compara la recuperación anterior de RAGSystem.query (una pasada del modelo y
+una búsqueda FAISS por cada consulta expandida) contra la ruta actual,
+_hybrid_search_batch: un solo encode de la pregunta, una búsqueda FAISS y las
+variaciones solo en la consulta BM25. Antes de medir se verifica que ambas
+rutas entregan al re-ranking el mismo mejor fragmento vectorial y se reporta
+cuántos de sus candidatos coinciden. Con --stub-embeddings no se carga ningún
+modelo y la corrida no necesita red.
+
+Uso:
+    python benchmarks/bench_query_batch.py --articles 500 --rounds 5 --stub-embeddings
+"""
+import argparse
+import time
+
+from common import PREGUNTAS, StubEmbeddings, percentiles, synthetic_legal_text
+from rag_system import RAGSystem
+
+# Candidatos que query entrega al re-ranking por palabras clave
+RERANK_CANDIDATES = 15
+
+
+def legacy_search(rag: RAGSystem, question: str) -> list:
+    """Ruta anterior: una llamada a similarity_search_with_score por variación."""
+    all_docs = {}
+    for query in rag._expand_query(question):
+        for doc, score in rag.vector_store.similarity_search_with_score(query, k=10):
+            doc_key = doc.page_content[:100]
+            if doc_key not in all_docs or all_docs[doc_key]['score'] > score:
+                all_docs[doc_key] = {'doc': doc, 'score': score}
+    ranked = sorted(all_docs.values(), key=lambda item: item['score'])
+    return [(item['doc'], item['score']) for item in ranked[:RERANK_CANDIDATES]]
+
+
+def hybrid_search(rag: RAGSystem, question: str) -> list:
+    """Ruta actual de query, sin la caché de embeddings de consultas."""
+    rag._embedding_cache.clear()
+    return rag._hybrid_search_batch([question])[0][:RERANK_CANDIDATES]
+
+
+def run(fn, rag: RAGSystem, rounds: int) -> dict:
+    samples = []
+    for _ in range(rounds):
+        for question in PREGUNTAS:
+            start = time.perf_counter()
+            fn(rag, question)
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="Embeddings deterministas por hashing en lugar de MiniLM")
+    args = parser.parse_args()
+
+    rag = RAGSystem(api_key="benchmark", embeddings=StubEmbeddings() if args.stub_embeddings else None)
+    rag.add_documents([synthetic_legal_text(args.articles)], [{"filename": "sintetico.txt"}])
+
+    # Verificar que la ruta actual conserva el mejor fragmento vectorial de la anterior
+    overlaps = []
+    for question in PREGUNTAS:
+        legacy_keys = [doc.page_content[:100] for doc, _ in legacy_search(rag, question)]
+        hybrid_keys = [doc.page_content[:100] for doc, _ in hybrid_search(rag, question)]
+        best = rag.vector_store.similarity_search_with_score(question, k=1)[0][0].page_content[:100]
+        assert best in legacy_keys and best in hybrid_keys, f"Resultados distintos para: {question}"
+        overlaps.append(len(set(legacy_keys) & set(hybrid_keys)) / len(legacy_keys))
+
+    # Calentamiento del modelo antes de medir
+    run(hybrid_search, rag, 1)
+
+    legacy = run(legacy_search, rag, args.rounds)
+    hybrid = run(hybrid_search, rag, args.rounds)
+
+    print(f"Variaciones por consulta (secuencial): {legacy}")
+    print(f"Híbrida (_hybrid_search_batch):        {hybrid}")
+    print(f"Candidatos en común con la ruta anterior: {sum(overlaps) / len(overlaps):.0%}")
+    print(f"Aceleración p50: {legacy['p50_ms'] / hybrid['p50_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
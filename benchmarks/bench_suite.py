@@ -0,0 +1,252 @@
+"""
+Suite de benchmarks reproducible sobre corpus legales sintéticos de tamaño
+configurable (de 1k a 1M chunks): rendimiento de add_documents, latencia de
+query (p50/p95/p99), memoria pico y tiempo de arranque con load_snapshot.
+
+Cada tamaño corre en dos procesos nuevos: "build" ingesta el corpus, mide
+consultas y guarda una instantánea; "load" mide el arranque (importar, crear
+RAGSystem y cargar la instantánea) y las consultas sobre el índice cargado.
+Así la memoria pico de un tamaño no arrastra la de los anteriores. Con
+--stub-embeddings no se carga ningún modelo: las corridas son deterministas y
+no necesitan red. Los resultados se guardan en JSON con el commit, para
+comparar entre versiones con --compare.
+
+Uso:
+    python benchmarks/bench_suite.py --chunks 1000 10000 100000 --stub-embeddings --output base.json
+    python benchmarks/bench_suite.py --compare base.json nuevo.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from common import PREGUNTAS, ROOT_DIR, StubEmbeddings, percentiles, synthetic_legal_text
+
+# Métricas comparadas con --compare (en todas, menor es mejor salvo las de rendimiento)
+HIGHER_IS_BETTER = {"ingest_chunks_per_second", "query_qps", "batch_qps"}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Memoria residente máxima del proceso (no disponible en Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa kilobytes y macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def make_questions(n: int) -> List[str]:
+    """Preguntas distintas entre sí para que ninguna se resuelva por caché."""
+    return [f"{PREGUNTAS[i % len(PREGUNTAS)]} Artículo {i + 1}" for i in range(n)]
+
+
+def make_rag(args):
+    from rag_system import RAGSystem
+    return RAGSystem(
+        api_key="benchmark",
+        cache_size=0,
+        index_type=args.index_type,
+        ann_threshold=args.ann_threshold,
+        embeddings=StubEmbeddings() if args.stub_embeddings else None
+    )
+
+
+def measure_queries(rag, questions: List[str]) -> dict:
+    # Calentamiento antes de medir
+    for question in questions[:10]:
+        rag.query(question)
+    samples = []
+    for question in questions:
+        start = time.perf_counter()
+        rag.query(question)
+        samples.append(time.perf_counter() - start)
+    return {"query_latency": percentiles(samples), "query_qps": round(len(samples) / sum(samples), 1)}
+
+
+def run_build(args) -> dict:
+    """Ingesta documentos sintéticos hasta llegar a --chunks y mide consultas sobre el índice."""
+    rag = make_rag(args)
+    ingest_seconds = 0.0
+    documents = 0
+    chunks = 0
+    while chunks < args.chunks:
+        text = synthetic_legal_text(args.articles_per_document, seed=args.seed * 1000003 + documents)
+        start = time.perf_counter()
+        rag.add_documents([text], [{"filename": f"ley_{documents:06d}.txt"}])
+        ingest_seconds += time.perf_counter() - start
+        documents += 1
+        chunks = rag.index_stats()["chunks"]
+
+    questions = make_questions(args.queries)
+    result = {
+        "chunks": chunks,
+        "documents": documents,
+        "faiss_index": rag.index_stats()["faiss_index"],
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ingest_chunks_per_second": round(chunks / ingest_seconds, 1),
+        **measure_queries(rag, questions)
+    }
+
+    start = time.perf_counter()
+    rag.query_batch(questions)
+    result["batch_qps"] = round(len(questions) / (time.perf_counter() - start), 1)
+
+    start = time.perf_counter()
+    rag.save_snapshot(args.snapshot_dir)
+    result["save_snapshot_seconds"] = round(time.perf_counter() - start, 3)
+    result["build_peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_load(args) -> dict:
+    """Arranque en frío: importar, crear RAGSystem, cargar la instantánea y consultar."""
+    start = time.perf_counter()
+    import rag_system  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rag = make_rag(args)
+    init_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rag.load_snapshot(args.snapshot_dir)
+    load_seconds = time.perf_counter() - start
+
+    questions = make_questions(args.queries)
+    start = time.perf_counter()
+    rag.query(questions[0])
+    first_query_seconds = time.perf_counter() - start
+
+    return {
+        "import_seconds": round(import_seconds, 3),
+        "init_seconds": round(init_seconds, 3),
+        "load_snapshot_seconds": round(load_seconds, 3),
+        "first_query_ms": round(first_query_seconds * 1000, 3),
+        "loaded_query_latency": measure_queries(rag, questions[1:])["query_latency"],
+        "load_peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_phase(phase: str, chunks: int, snapshot_dir: str, args) -> dict:
+    """Ejecuta una fase en un proceso nuevo y devuelve su resultado."""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--phase", phase,
+        "--chunks", str(chunks), "--snapshot-dir", snapshot_dir,
+        "--queries", str(args.queries), "--seed", str(args.seed),
+        "--articles-per-document", str(args.articles_per_document),
+        "--index-type", args.index_type, "--ann-threshold", str(args.ann_threshold)
+    ]
+    if args.stub_embeddings:
+        command.append("--stub-embeddings")
+    completed = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base_path: str, new_path: str):
+    """Imprime el cambio porcentual de cada métrica entre dos corridas, por tamaño."""
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"base {base.get('commit')} -> nuevo {new.get('commit')}")
+
+    def flatten(result: dict, prefix: str = "") -> dict:
+        values = {}
+        for key, value in result.items():
+            if isinstance(value, dict):
+                values.update(flatten(value, f"{prefix}{key}."))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[f"{prefix}{key}"] = value
+        return values
+
+    base_by_size = {result["target_chunks"]: flatten(result) for result in base["results"]}
+    for result in new["results"]:
+        size = result["target_chunks"]
+        if size not in base_by_size:
+            continue
+        print(f"\n{size} chunks")
+        old_values = base_by_size[size]
+        for metric, value in flatten(result).items():
+            old = old_values.get(metric)
+            if not old or metric in ("target_chunks", "chunks", "documents"):
+                continue
+            change = (value - old) / old * 100
+            better = change > 0 if metric.split(".")[0] in HIGHER_IS_BETTER else change < 0
+            mark = "" if abs(change) < 5 else (" (mejor)" if better else " (peor)")
+            print(f"  {metric:40s} {old:>12} -> {value:>12} {change:+7.1f}%{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Tamaños de corpus a medir, en chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas medidas por tamaño")
+    parser.add_argument("--articles-per-document", type=int, default=400,
+                        help="Artículos por documento sintético (~330 chunks)")
+    parser.add_argument("--index-type", default="flat", help="FAISS_INDEX_TYPE del sistema medido")
+    parser.add_argument("--ann-threshold", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="Embeddings deterministas por hashing en lugar de MiniLM")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Compara dos archivos de resultados en lugar de medir")
+    parser.add_argument("--phase", choices=("build", "load"), help=argparse.SUPPRESS)
+    parser.add_argument("--snapshot-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.phase:
+        # Proceso hijo: un solo tamaño, resultado como última línea de stdout
+        args.chunks = args.chunks[0]
+        result = run_build(args) if args.phase == "build" else run_load(args)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for size in args.chunks:
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            result = {"target_chunks": size, **run_phase("build", size, snapshot_dir, args)}
+            result.update(run_phase("load", size, snapshot_dir, args))
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "embeddings": "stub" if args.stub_embeddings else "sentence-transformers/all-MiniLM-L6-v2",
+            "index_type": args.index_type,
+            "queries": args.queries,
+            "seed": args.seed,
+            "results": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
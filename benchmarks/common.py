@@ -0,0 +1,191 @@
+"""Utilidades compartidas por los benchmarks del Asistente Legal RAG."""
+import random
+import statistics
+import sys
+import textwrap
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Permitir ejecutar los scripts desde la raíz del repositorio
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+TEMAS = [
+    "licencia de conducción", "contrato de arrendamiento", "impuesto predial",
+    "servicios públicos", "propiedad horizontal", "tránsito terrestre",
+    "contratación estatal", "derecho de petición", "seguridad social",
+    "código de policía",
+]
+
+VERBOS = [
+    "deberá acreditar", "podrá solicitar", "tendrá derecho a", "estará obligado a",
+    "deberá tramitar", "podrá presentar",
+]
+
+OBJETOS = [
+    "los requisitos establecidos por la autoridad competente",
+    "el pago de la tarifa correspondiente",
+    "un certificado de aptitud física y mental",
+    "la documentación que determine el reglamento",
+    "las sanciones previstas en el presente código",
+    "el plazo de treinta días hábiles",
+]
+
+PREGUNTAS = [
+    "¿Cuáles son los requisitos para obtener la licencia de conducción?",
+    "¿Qué sanciones aplican por no pagar el impuesto predial?",
+    "¿Cuál es el plazo para responder un derecho de petición?",
+    "¿Cuáles son las obligaciones del arrendatario?",
+    "¿Cómo es el procedimiento para la contratación estatal?",
+    "¿Qué derechos tiene el propietario en propiedad horizontal?",
+    "requisitos licencia de conducción",
+    "¿Cuándo vence el plazo para afiliarse a la seguridad social?",
+]
+
+
+def synthetic_legal_text(n_articles: int, seed: int = 0) -> str:
+    """Genera un texto legal sintético en español con artículos numerados."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(1, n_articles + 1):
+        if i % 25 == 1:
+            parts.append(f"CAPITULO {_roman(i // 25 + 1)}\n")
+        tema = rng.choice(TEMAS)
+        sentences = [
+            f"Toda persona que solicite {tema} {rng.choice(VERBOS)} {rng.choice(OBJETOS)}."
+            for _ in range(rng.randint(2, 5))
+        ]
+        parts.append(f"Artículo {i}. " + " ".join(sentences) + "\n")
+        if rng.random() < 0.2:
+            parts.append(f"Parágrafo. Lo dispuesto en este artículo aplica a {rng.choice(TEMAS)}.\n")
+    return "\n".join(parts)
+
+
+def synthetic_pdf(path: str, n_pages: int, seed: int = 0, lines_per_page: int = 60):
+    """
+    Escribe un PDF de texto sintético página a página, sin dependencias externas.
+
+    Cada página tiene lines_per_page líneas de artículos generados con
+    synthetic_legal_text; el archivo se escribe en streaming.
+    """
+    text_lines = []
+    article = 0
+    offsets = {}
+
+    def next_lines():
+        nonlocal article
+        while len(text_lines) < lines_per_page:
+            article += 1
+            lines = [
+                line.replace("Artículo 1.", f"Artículo {article}.")
+                for line in synthetic_legal_text(1, seed=seed * 1000003 + article).splitlines()
+                if not line.startswith("CAPITULO")
+            ]
+            if article % 25 == 1:
+                lines.insert(0, f"CAPITULO {_roman(article // 25 + 1)}")
+            for line in lines:
+                text_lines.extend(textwrap.wrap(line, 95) or [""])
+        page = text_lines[:lines_per_page]
+        del text_lines[:lines_per_page]
+        return page
+
+    def escape(line: str) -> bytes:
+        line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        return line.encode("cp1252", errors="replace")
+
+    with open(path, "wb") as f:
+        def write_object(number: int, body: bytes):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        kids = []
+        for i in range(n_pages):
+            page_obj, content_obj = 4 + 2 * i, 5 + 2 * i
+            stream = b"BT /F1 9 Tf 11 TL 40 800 Td " + b" ".join(
+                b"(" + escape(line) + b") Tj T*" for line in next_lines()
+            ) + b" ET"
+            write_object(content_obj, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+            write_object(page_obj, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>"
+            ).encode())
+            kids.append(f"{page_obj} 0 R")
+        write_object(2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {n_pages} >>".encode())
+
+        xref_offset = f.tell()
+        size = max(offsets) + 1
+        f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for number in range(1, size):
+            f.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def synthetic_docx(path: str, n_articles: int, seed: int = 0):
+    """Escribe un DOCX con un párrafo por línea de synthetic_legal_text."""
+    import docx
+    document = docx.Document()
+    for line in synthetic_legal_text(n_articles, seed).splitlines():
+        if line:
+            document.add_paragraph(line)
+    document.save(path)
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Embeddings deterministas sin modelo: bolsa de palabras con hashing (crc32) en dim
+    dimensiones, normalizada. Sirve para medir el sistema sin descargar ni ejecutar
+    MiniLM; los textos que comparten palabras quedan cerca, como en un modelo real.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._buckets: Dict[str, int] = {}
+
+    def _vector(self, text: str) -> List[float]:
+        buckets = self._buckets
+        indices = []
+        for token in text.lower().split():
+            index = buckets.get(token)
+            if index is None:
+                index = buckets[token] = zlib.crc32(token.encode("utf-8")) % self.dim
+            indices.append(index)
+        vector = np.bincount(indices, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Resume una lista de latencias (segundos) en milisegundos."""
+    ordered = sorted(samples)
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+    return {
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def _roman(n: int) -> str:
+    numerals = [(10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]
+    result = ""
+    for value, symbol in numerals:
+        while n >= value:
+            result += symbol
+            n -= value
+    return result
@@ -0,0 +1,94 @@
+"""
+Prueba de carga: mide la latencia de /api/query con y sin cargas de documentos
+concurrentes contra un servidor en ejecución.
+
+Uso:
+    python main.py  # en otra terminal
+    python benchmarks/load_test.py --url http://localhost:8000 --duration 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import PREGUNTAS, percentiles, synthetic_legal_text
+
+
+async def query_worker(client: httpx.AsyncClient, deadline: float, samples: list, statuses: dict):
+    i = 0
+    while time.perf_counter() < deadline:
+        question = PREGUNTAS[i % len(PREGUNTAS)]
+        i += 1
+        start = time.perf_counter()
+        response = await client.post("/api/query", json={"question": question})
+        elapsed = time.perf_counter() - start
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            samples.append(elapsed)
+        elif response.status_code == 503:
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+
+async def upload_and_wait(client: httpx.AsyncClient, files: dict) -> httpx.Response:
+    """Sube archivos y espera a que termine el trabajo de carga en segundo plano."""
+    response = await client.post("/api/upload", files=files)
+    if response.status_code == 202:
+        while (await client.get(response.json()["job_url"])).json()["status"] not in ("completed", "failed"):
+            await asyncio.sleep(0.2)
+    return response
+
+
+async def upload_worker(client: httpx.AsyncClient, deadline: float, payload: bytes, statuses: dict):
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        files = {"files": (f"carga_{n}.txt", payload, "text/plain")}
+        response = await upload_and_wait(client, files)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def phase(url: str, duration: float, concurrency: int, uploaders: int, payload: bytes) -> dict:
+    samples, query_statuses, upload_statuses = [], {}, {}
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(base_url=url, timeout=300) as client:
+        tasks = [query_worker(client, deadline, samples, query_statuses) for _ in range(concurrency)]
+        tasks += [upload_worker(client, deadline, payload, upload_statuses) for _ in range(uploaders)]
+        await asyncio.gather(*tasks)
+    return {
+        "queries_ok": len(samples),
+        "latency": percentiles(samples) if samples else None,
+        "query_statuses": query_statuses,
+        "upload_statuses": upload_statuses
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--uploaders", type=int, default=2)
+    parser.add_argument("--upload-articles", type=int, default=3000)
+    args = parser.parse_args()
+
+    seed_doc = synthetic_legal_text(300).encode("utf-8")
+    payload = synthetic_legal_text(args.upload_articles, seed=1).encode("utf-8")
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=300) as client:
+        response = await upload_and_wait(client, {"files": ("base.txt", seed_doc, "text/plain")})
+        response.raise_for_status()
+
+    baseline = await phase(args.url, args.duration, args.concurrency, 0, payload)
+    print(f"Solo consultas:          {baseline}")
+
+    under_load = await phase(args.url, args.duration, args.concurrency, args.uploaders, payload)
+    print(f"Consultas + cargas:      {under_load}")
+
+    if baseline["latency"] and under_load["latency"]:
+        ratio = under_load["latency"]["p99_ms"] / baseline["latency"]["p99_ms"]
+        print(f"Variación de p99 bajo carga: {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
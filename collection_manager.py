@@ -0,0 +1,224 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rag_system import RAGSystem
+
+logger = logging.getLogger(__name__)
+
+# Colección usada cuando la petición no indica ninguna
+DEFAULT_COLLECTION = "default"
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def validate_collection_name(name: str) -> str:
+    """Devuelve el nombre si es válido (letras, números, _ y -) o lanza ValueError."""
+    if not _NAME_RE.match(name or ""):
+        raise ValueError(f"Nombre de colección inválido: {name!r}. Use letras, números, _ o - (máximo 64)")
+    return name
+
+
+class CollectionManager:
+    """
+    Colecciones de documentos con nombre, cada una con su propio RAGSystem.
+
+    Cada colección guarda sus instantáneas en directory/<nombre>. Las usadas
+    recientemente quedan en memoria; al superar max_resident colecciones o
+    memory_budget bytes (según RAGSystem.memory_estimate) las menos usadas se
+    guardan en disco y se descargan, y se vuelven a cargar al pedirlas. Una
+    colección en uso (acquire sin su release) nunca se descarga.
+    """
+
+    def __init__(self, factory: Callable[[], RAGSystem], directory: str, max_resident: int = 8,
+                 memory_budget: Optional[int] = None):
+        self._factory = factory
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_resident = max(1, max_resident)
+        self.memory_budget = memory_budget
+
+        self._resident: "OrderedDict[str, RAGSystem]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        # index_version de la última instantánea: distinta a la actual si hay cambios sin guardar
+        self._saved_version: Dict[str, int] = {}
+        self._name_locks: Dict[str, threading.Lock] = {}
+        # Orden de locks: primero el de la colección, luego _lock
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.evictions = 0
+
+    def migrate_single_index(self):
+        """
+        Mueve a la colección por defecto la instantánea del formato anterior,
+        cuando había un solo índice guardado directamente en directory.
+        """
+        current = self.directory / "CURRENT"
+        target = self.snapshot_dir(DEFAULT_COLLECTION)
+        if not current.exists() or (target / "CURRENT").exists():
+            return
+        target.mkdir(parents=True, exist_ok=True)
+        for snapshot in self.directory.glob("snapshot-*"):
+            snapshot.replace(target / snapshot.name)
+        # CURRENT al final: si se interrumpe, la migración se repite al arrancar
+        current.replace(target / "CURRENT")
+
+    def snapshot_dir(self, name: str) -> Path:
+        return self.directory / name
+
+    def _name_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._name_locks.setdefault(name, threading.Lock())
+
+    def exists(self, name: str) -> bool:
+        """La colección está en memoria o tiene una instantánea en disco."""
+        with self._lock:
+            if name in self._resident:
+                return True
+        return (self.snapshot_dir(name) / "CURRENT").exists()
+
+    def names(self) -> List[str]:
+        """Colecciones en memoria o guardadas en disco."""
+        with self._lock:
+            resident = set(self._resident)
+        on_disk = {path.parent.name for path in self.directory.glob("*/CURRENT")}
+        return sorted(resident | on_disk)
+
+    def acquire(self, name: str, create: bool = True) -> RAGSystem:
+        """
+        RAGSystem de la colección, cargándolo de disco si estaba descargado.
+
+        Con create=False lanza KeyError si la colección no existe. Cada acquire
+        debe terminar con un release; mientras tanto la colección no se descarga.
+        """
+        validate_collection_name(name)
+        # En memoria: sin esperar el lock de la colección, que se toma al guardarla
+        rag = self._use_resident(name)
+        if rag is not None:
+            return rag
+
+        with self._name_lock(name):
+            rag = self._use_resident(name)
+            if rag is not None:
+                return rag
+
+            if not create and not self.exists(name):
+                raise KeyError(name)
+            rag = self._factory()
+            try:
+                rag.load_snapshot(str(self.snapshot_dir(name)))
+            except Exception:
+                logger.exception("No se pudo cargar la instantánea de la colección %s; se inicia vacía", name)
+                rag.reset()
+
+            with self._lock:
+                self._resident[name] = rag
+                self._saved_version[name] = rag.index_version
+                self._in_use[name] = self._in_use.get(name, 0) + 1
+                self.loads += 1
+
+        # Hacer sitio descargando otras colecciones; la recién cargada está en uso
+        self.evict_over_budget()
+        return rag
+
+    def _use_resident(self, name: str) -> Optional[RAGSystem]:
+        with self._lock:
+            rag = self._resident.get(name)
+            if rag is not None:
+                self._resident.move_to_end(name)
+                self._in_use[name] = self._in_use.get(name, 0) + 1
+            return rag
+
+    def release(self, name: str):
+        with self._lock:
+            remaining = self._in_use.get(name, 0) - 1
+            if remaining > 0:
+                self._in_use[name] = remaining
+            else:
+                self._in_use.pop(name, None)
+
+    def save(self, name: str):
+        """Guarda la instantánea de una colección en memoria, si tiene cambios."""
+        with self._name_lock(name):
+            self._save(name)
+
+    def _save(self, name: str):
+        # Con el lock de la colección tomado: una descarga y recarga no se cruzan con el guardado
+        with self._lock:
+            rag = self._resident.get(name)
+        if rag is None:
+            return
+        version = rag.index_version
+        if version != self._saved_version.get(name):
+            rag.save_snapshot(str(self.snapshot_dir(name)))
+            with self._lock:
+                self._saved_version[name] = version
+
+    def evict_over_budget(self):
+        """Descarga las colecciones menos usadas hasta cumplir el límite de memoria."""
+        while True:
+            with self._lock:
+                victim = self._next_victim()
+            if victim is None:
+                return
+            name, rag = victim
+            with self._name_lock(name):
+                self._save(name)
+                with self._lock:
+                    # Se volvió a pedir o se modificó mientras se guardaba: queda en memoria
+                    if (self._in_use.get(name) or self._resident.get(name) is not rag
+                            or rag.index_version != self._saved_version.get(name)):
+                        continue
+                    del self._resident[name]
+                    self._saved_version.pop(name, None)
+                    self.evictions += 1
+
+    def _next_victim(self) -> Optional[Tuple[str, RAGSystem]]:
+        """La colección menos usada que no está en uso, si se excede el límite (con _lock tomado)."""
+        over_budget = len(self._resident) > self.max_resident or (
+            self.memory_budget is not None
+            and sum(rag.memory_estimate() for rag in self._resident.values()) > self.memory_budget
+        )
+        if not over_budget:
+            return None
+        for name, rag in self._resident.items():
+            if not self._in_use.get(name):
+                return name, rag
+        return None
+
+    def save_all(self):
+        """Guarda las colecciones en memoria con cambios (p. ej. al detener el servidor)."""
+        with self._lock:
+            names = list(self._resident)
+        for name in names:
+            self.save(name)
+
+    def stats(self) -> dict:
+        """Colecciones en memoria con su tamaño y sus cachés, y contadores de cargas y descargas."""
+        with self._lock:
+            resident = dict(self._resident)
+            in_use = dict(self._in_use)
+        return {
+            "resident": {
+                name: {
+                    "documents": len(rag.documents_loaded),
+                    "chunks": rag.index_stats()["chunks"],
+                    "memory_estimate_mb": round(rag.memory_estimate() / 2 ** 20, 1),
+                    "in_use": in_use.get(name, 0),
+                    "query_cache": rag.cache_stats()
+                }
+                for name, rag in resident.items()
+            },
+            "max_resident": self.max_resident,
+            "memory_budget_mb": round(self.memory_budget / 2 ** 20, 1) if self.memory_budget else None,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+    def resident_items(self) -> List[Tuple[str, RAGSystem]]:
+        with self._lock:
+            return list(self._resident.items())
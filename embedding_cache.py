@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from file_lock import file_lock
+
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings por hash de chunk y modelo.
+
+    Cada modelo tiene su propio directorio con tres archivos de solo anexado:
+    vectors.f32 (filas float32 contiguas, leídas con memory-map), keys.txt
+    (un hash por línea; la línea i corresponde a la fila i) y meta.json
+    (modelo y dimensión). Varios procesos (workers de uvicorn) pueden
+    compartir el directorio: las escrituras se hacen con un lock de archivo
+    y cada proceso lee las claves que anexaron los demás.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.model_name = model_name
+        self.directory = Path(directory) / re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._vectors_path = self.directory / "vectors.f32"
+        self._keys_path = self.directory / "keys.txt"
+        self._meta_path = self.directory / "meta.json"
+        self._lock_path = self.directory / "write.lock"
+
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[str, int] = {}
+        # Bytes y líneas de keys.txt ya leídos: las líneas siguientes son filas nuevas
+        self._keys_offset = 0
+        self._row_count = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        with self._lock, file_lock(self._lock_path):
+            self._repair()
+            self._refresh()
+
+    def _read_dim(self) -> bool:
+        if self.dim is None and self._meta_path.exists():
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        return self.dim is not None
+
+    def _repair(self):
+        """Si una escritura se interrumpió, deja solo las filas completas en ambos archivos (con el lock de archivo)."""
+        if not self._read_dim() or not self._keys_path.exists():
+            return
+        with open(self._keys_path, encoding="utf-8") as f:
+            keys = f.read().split()
+        row_bytes = self.dim * 4
+        vector_bytes = os.path.getsize(self._vectors_path) if self._vectors_path.exists() else 0
+        complete_rows = min(len(keys), vector_bytes // row_bytes)
+        if complete_rows < len(keys):
+            with open(self._keys_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{key}\n" for key in keys[:complete_rows])
+
+    def _refresh(self):
+        """
+        Incorpora las claves anexadas a keys.txt desde la última lectura, por
+        este u otro proceso. Los vectores se escriben antes que sus claves, así
+        que toda línea completa tiene su fila; una línea a medio escribir se
+        lee en la siguiente llamada.
+        """
+        try:
+            size = os.path.getsize(self._keys_path)
+        except FileNotFoundError:
+            return
+        if size <= self._keys_offset or not self._read_dim():
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(size - self._keys_offset)
+        complete = data.rfind(b"\n") + 1
+        if not complete:
+            return
+        self._keys_offset += complete
+        for key in data[:complete].decode("utf-8").split():
+            self._rows.setdefault(key, self._row_count)
+            self._row_count += 1
+        self._remap()
+
+    def _remap(self):
+        rows = self._row_count
+        self._vectors = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+
+    def get_many(self, hashes: List[Optional[str]], record_stats: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        Devuelve el vector de cada hash o None si no está en caché. Con
+        record_stats=False la lectura no cuenta en los aciertos y fallos
+        (p. ej. al re-puntuar candidatos de una búsqueda).
+        """
+        with self._lock:
+            if any(key not in self._rows for key in hashes):
+                # Pueden haberlos calculado otros procesos
+                self._refresh()
+            result = []
+            hits = 0
+            for key in hashes:
+                row = self._rows.get(key)
+                if row is None:
+                    result.append(None)
+                else:
+                    hits += 1
+                    result.append(np.array(self._vectors[row]))
+            if record_stats:
+                self.hits += hits
+                self.misses += len(hashes) - hits
+            return result
+
+    def put_many(self, hashes: List[str], vectors: List[List[float]]):
+        """Anexa vectores nuevos a la caché en disco."""
+        with self._lock, file_lock(self._lock_path):
+            # Con el lock de archivo: las claves de otros procesos ya están en _rows
+            self._refresh()
+            new = {}
+            for key, vector in zip(hashes, vectors):
+                if key not in self._rows and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+
+            matrix = np.asarray(list(new.values()), dtype=np.float32)
+            if not self._read_dim():
+                self.dim = matrix.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+
+            # Vectores primero y claves después: una clave nunca apunta a una fila incompleta.
+            # Las filas sin clave de una escritura interrumpida se descartan antes de anexar.
+            with open(self._vectors_path, "ab") as f:
+                if os.fstat(f.fileno()).st_size > self._row_count * 4 * self.dim:
+                    f.truncate(self._row_count * 4 * self.dim)
+                f.write(matrix.tobytes())
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{key}\n" for key in new)
+            self._refresh()
+
+    def stats(self) -> dict:
+        """Tamaño y uso de la caché."""
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "vectors": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# torch: sentence-transformers (PyTorch); onnx: modelo exportado a ONNX y ejecutado con ONNX Runtime
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Modelo sentence-transformers exportado a ONNX, ejecutado con ONNX Runtime en CPU.
+
+    model_dir es el directorio de la exportación (p. ej. con
+    `optimum-cli export onnx`): el modelo (model_file, que puede ser la versión
+    cuantizada a int8 de quantize_onnx_model) y tokenizer.json. Si el modelo
+    no incluye el pooling, se aplica mean pooling sobre last_hidden_state y se
+    normalizan los vectores, como all-MiniLM-L6-v2 en sentence-transformers.
+    """
+
+    def __init__(self, model_dir: str, model_file: str = "model.onnx", batch_size: int = 32,
+                 threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+        self.batch_size = max(1, batch_size)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_dir / model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {node.name for node in self.session.get_inputs()}
+        outputs = [node.name for node in self.session.get_outputs()]
+        self._pooled = "sentence_embedding" in outputs
+        self._output = "sentence_embedding" if self._pooled else "last_hidden_state"
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self._max_length())
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+
+    def _max_length(self) -> int:
+        """Ventana del modelo: la de sentence-transformers si se exportó, si no la del tokenizador."""
+        for name, key in (("sentence_bert_config.json", "max_seq_length"),
+                          ("tokenizer_config.json", "model_max_length")):
+            path = self.model_dir / name
+            if path.exists():
+                with open(path, encoding="utf-8") as f:
+                    value = json.load(f).get(key)
+                if value and value < 100000:
+                    return value
+        return 256
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        output = self.session.run([self._output], {name: feeds[name] for name in self._inputs})[0]
+        if self._pooled:
+            return output
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Lotes de textos de largo similar: menos relleno en cada pasada del modelo
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = self._encode([texts[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def quantize_onnx_model(model_dir: str, model_file: str = "model.onnx",
+                        output_file: str = "model_int8.onnx") -> str:
+    """Cuantiza los pesos del modelo ONNX a int8 (dinámica) y devuelve la ruta del nuevo modelo."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output = os.path.join(model_dir, output_file)
+    quantize_dynamic(os.path.join(model_dir, model_file), output, weight_type=QuantType.QInt8)
+    return output
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Modelo de embeddings que se importa y carga en el primer uso.
+
+    Importar sentence-transformers/torch y cargar el modelo toma varios
+    segundos: con la carga diferida el servidor acepta conexiones antes y el
+    modelo se precalienta en segundo plano (ver RAGSystem.warm_up).
+
+    backend elige la implementación (EMBEDDING_BACKENDS): "torch" usa
+    HuggingFaceEmbeddings y "onnx" OnnxEmbeddings con el modelo exportado en
+    onnx_dir. batch_size son los textos por pasada del modelo y threads los
+    hilos de cómputo (None: los del runtime).
+    """
+
+    def __init__(self, model_name: str, model_kwargs: Optional[dict] = None, backend: str = "torch",
+                 batch_size: int = 32, threads: Optional[int] = None, onnx_dir: Optional[str] = None,
+                 onnx_file: str = "model.onnx"):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Backend de embeddings no soportado: {backend}. Use {', '.join(EMBEDDING_BACKENDS)}")
+        if backend == "onnx" and not onnx_dir:
+            raise ValueError("El backend onnx necesita el directorio del modelo exportado (onnx_dir)")
+        self.model_name = model_name
+        self.model_kwargs = model_kwargs or {'device': 'cpu'}
+        self.backend = backend
+        self.batch_size = batch_size
+        self.threads = threads
+        self.onnx_dir = onnx_dir
+        self.onnx_file = onnx_file
+        self._model: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        """Identifica los vectores que produce: el modelo y, con ONNX, el archivo (p. ej. la versión int8)."""
+        if self.backend == "onnx":
+            return f"{self.model_name}@onnx-{Path(self.onnx_file).stem}"
+        return self.model_name
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def model(self) -> Embeddings:
+        """El modelo cargado; la primera llamada lo carga y las concurrentes esperan."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self) -> Embeddings:
+        if self.backend == "onnx":
+            return OnnxEmbeddings(self.onnx_dir, self.onnx_file, self.batch_size, self.threads)
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs=self.model_kwargs,
+            encode_kwargs={"batch_size": self.batch_size}
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model().embed_query(text)
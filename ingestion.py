@@ -0,0 +1,293 @@
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from metrics import metrics
+from rag_system import DocumentProcessor, RAGSystem
+from text_cache import PageTextCache
+from workers import BoundedExecutor, PoolSaturatedError
+
+# Páginas mínimas por tarea al repartir un PDF entre los workers
+PAGES_PER_TASK = 16
+
+
+def _text_cache(cache_dir: Optional[str]) -> Optional[PageTextCache]:
+    return PageTextCache(cache_dir) if cache_dir else None
+
+
+def split_segments(segments: Iterable[Tuple[Optional[int], str]],
+                   filename: str) -> Tuple[str, List[Document], Dict[str, float]]:
+    """
+    Divide en chunks las partes de un documento y calcula el hash de su texto.
+
+    Como la extracción y la división se intercalan, también devuelve los
+    segundos de cada una: extract es el tiempo esperando la siguiente parte.
+    """
+    hasher = hashlib.sha256()
+    timings = {"extract": 0.0, "split": 0.0}
+
+    def hashed():
+        parts = iter(segments)
+        while True:
+            start = time.perf_counter()
+            segment = next(parts, None)
+            timings["extract"] += time.perf_counter() - start
+            if segment is None:
+                return
+            hasher.update(segment[1].encode('utf-8'))
+            yield segment
+
+    start = time.perf_counter()
+    chunks = list(RAGSystem.split_stream(hashed(), {"filename": filename}))
+    timings["split"] = time.perf_counter() - start - timings["extract"]
+    if not chunks:
+        raise ValueError(f"El archivo {filename} está vacío o no se pudo leer")
+    # Mismo hash que RAGSystem.content_hash sobre el texto completo
+    return hasher.hexdigest(), chunks, timings
+
+
+def extract_chunks(file_path: str, filename: str, file_hash: Optional[str] = None,
+                   cache_dir: Optional[str] = None) -> Tuple[str, List[Document], Dict[str, float]]:
+    """Extrae y divide un documento; se ejecuta dentro del pool de procesos.
+
+    El texto se lee por páginas o párrafos y se divide a medida que llega, sin
+    armar el documento completo en memoria. Devuelve el hash del texto
+    extraído, sus chunks y los segundos de extracción y división.
+    """
+    segments = DocumentProcessor.iter_document(file_path, filename, _text_cache(cache_dir), file_hash)
+    return split_segments(segments, filename)
+
+
+def count_pdf_pages(file_path: str, file_hash: str, cache_dir: Optional[str]) -> int:
+    """Número de páginas de un PDF; se ejecuta dentro del pool de procesos."""
+    return DocumentProcessor.pdf_page_count(file_path, _text_cache(cache_dir), file_hash)
+
+
+def cache_pdf_pages(file_path: str, start: int, stop: int, file_hash: str, cache_dir: str) -> int:
+    """Extrae las páginas [start, stop) de un PDF al caché de texto; se ejecuta dentro del pool de procesos."""
+    pages = DocumentProcessor.iter_pdf_pages(file_path, start, stop, PageTextCache(cache_dir), file_hash)
+    return sum(1 for _ in pages)
+
+
+def _page_ranges(pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Reparte las páginas 1..pages en rangos contiguos, uno por worker como máximo."""
+    tasks = max(1, min(workers, pages // PAGES_PER_TASK))
+    size = -(-pages // tasks)
+    return [(start, min(start + size, pages + 1)) for start in range(1, pages + 1, size)]
+
+
+async def _run_when_available(pool: BoundedExecutor, fn, *args):
+    """Como pool.run, pero espera cupo en lugar de fallar: el archivo ya fue aceptado."""
+    while True:
+        try:
+            future = pool.submit(fn, *args)
+        except PoolSaturatedError:
+            await asyncio.wrap_future(pool.slot_released())
+            continue
+        return await asyncio.wrap_future(future)
+
+
+def _start_extraction(pool: BoundedExecutor, file_path: str, filename: str, file_hash: str,
+                      cache_dir: Optional[str]) -> Awaitable[Tuple[str, List[Document], Dict[str, float]]]:
+    """
+    Envía la primera tarea de un archivo al pool (puede lanzar PoolSaturatedError)
+    y devuelve lo que falta esperar para obtener (hash del texto, chunks, tiempos).
+
+    Los PDF con muchas páginas se extraen por rangos en paralelo al caché de
+    texto (uno temporal si no hay cache_dir) y luego un worker los divide en
+    orden leyendo de ese caché: el texto nunca pasa por el proceso principal.
+    """
+    if Path(filename).suffix.lower() != '.pdf':
+        return asyncio.wrap_future(pool.submit(extract_chunks, file_path, filename, file_hash, cache_dir))
+
+    count_future = asyncio.wrap_future(pool.submit(count_pdf_pages, file_path, file_hash, cache_dir))
+
+    async def extract_pdf():
+        pages = await count_future
+        ranges = _page_ranges(pages, pool.max_workers)
+        if len(ranges) == 1:
+            return await _run_when_available(pool, extract_chunks, file_path, filename, file_hash, cache_dir)
+
+        page_dir = cache_dir or tempfile.mkdtemp(prefix="rag-pages-")
+        try:
+            if cache_dir is None:
+                PageTextCache(page_dir).set_page_count(file_hash, pages)
+            start_time = time.perf_counter()
+            await asyncio.gather(*(
+                _run_when_available(pool, cache_pdf_pages, file_path, start, stop, file_hash, page_dir)
+                for start, stop in ranges
+            ))
+            extract_seconds = time.perf_counter() - start_time
+            content_hash, chunks, timings = await _run_when_available(
+                pool, extract_chunks, file_path, filename, file_hash, page_dir
+            )
+            # La división leyó las páginas del caché: la extracción es lo que tardaron los rangos en paralelo
+            timings["extract"] += extract_seconds
+            return content_hash, chunks, timings
+        finally:
+            if cache_dir is None:
+                await _run_when_available(pool, shutil.rmtree, page_dir, True)
+
+    return extract_pdf()
+
+
+class IngestProgress:
+    """
+    Avance de una ingesta, actualizado por ingest_files a medida que terminan
+    las extracciones y los lotes de embedding.
+    """
+
+    def __init__(self):
+        self.files_extracted = 0
+        self.chunks_extracted = 0
+        self.chunks_indexed = 0
+        self.batches = 0
+        self.loaded: List[str] = []
+        self.skipped: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "files_extracted": self.files_extracted,
+            "chunks_extracted": self.chunks_extracted,
+            "chunks_indexed": self.chunks_indexed,
+            "batches": self.batches,
+            "files": self.loaded,
+            "skipped": self.skipped,
+            "errors": self.errors
+        }
+
+
+def _duplicate_reason(filename: str, existing: str) -> str:
+    if existing == filename:
+        return "Sin cambios desde la última carga"
+    return f"Contenido idéntico a {existing}"
+
+
+async def ingest_files(
+    rag_system: RAGSystem,
+    files: List[Tuple[str, str, str]],
+    extract_pool: BoundedExecutor,
+    embed_pool: BoundedExecutor,
+    batch_size: int = 256,
+    text_cache_dir: Optional[str] = None,
+    progress: Optional[IngestProgress] = None,
+    on_batch: Optional[Callable[[], None]] = None
+) -> dict:
+    """
+    Ingesta en pipeline: la extracción de cada archivo corre en paralelo en el
+    pool de procesos y los chunks se embeben en lotes de tamaño fijo a medida
+    que cada extracción termina, sin esperar al archivo más lento.
+
+    files es una lista de (ruta, nombre, hash del archivo). Los archivos ya
+    cargados sin cambios no se extraen ni se embeben. Con text_cache_dir, el
+    texto de cada página de PDF se guarda en disco y no se vuelve a extraer. Devuelve los archivos
+    cargados, los omitidos y los errores por archivo.
+
+    Cada lote queda consultable al terminar; progress refleja el avance y
+    on_batch se llama después de cada lote (p. ej. para guardar un checkpoint).
+    Si los pools están llenos se espera cupo en lugar de fallar.
+    """
+    progress = progress or IngestProgress()
+    chunk_queue: asyncio.Queue = asyncio.Queue()
+    errors = progress.errors
+    skipped = progress.skipped
+
+    # Omitir archivos idénticos a uno ya cargado o repetidos en la misma carga
+    to_extract = []
+    seen_hashes = {}
+    for file_path, filename, file_hash in files:
+        existing = rag_system.find_duplicate(file_hash=file_hash) or seen_hashes.get(file_hash)
+        if existing:
+            skipped[filename] = _duplicate_reason(filename, existing)
+            continue
+        seen_hashes[file_hash] = filename
+        to_extract.append((file_path, filename, file_hash))
+
+    async def extract():
+        remaining = list(to_extract)
+        pending = {}
+        try:
+            while remaining or pending:
+                # Mantener como máximo un archivo por worker para no acaparar el pool
+                while remaining and len(pending) < extract_pool.max_workers:
+                    file_path, filename, file_hash = remaining[0]
+                    try:
+                        extraction = _start_extraction(extract_pool, file_path, filename, file_hash, text_cache_dir)
+                    except PoolSaturatedError:
+                        # Los archivos ya fueron aceptados: se reintenta cuando haya cupo
+                        break
+                    remaining.pop(0)
+                    pending[asyncio.ensure_future(extraction)] = (filename, file_hash)
+
+                if not pending:
+                    await asyncio.wrap_future(extract_pool.slot_released())
+                    continue
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    filename, file_hash = pending.pop(task)
+                    try:
+                        content_hash, chunks, timings = task.result()
+                    except Exception as e:
+                        errors[filename] = str(e)
+                        metrics.inc("rag_ingest_errors_total")
+                        continue
+                    for stage, seconds in timings.items():
+                        metrics.record_stage(stage, seconds, pipeline="ingest")
+                    progress.files_extracted += 1
+                    progress.chunks_extracted += len(chunks)
+                    # El archivo cambió pero el texto extraído es el mismo
+                    existing = rag_system.find_duplicate(content_hash=content_hash)
+                    if existing:
+                        skipped[filename] = _duplicate_reason(filename, existing)
+                        continue
+                    entry = RAGSystem.document_entry(filename, chunks, content_hash, file_hash)
+                    await chunk_queue.put((entry, chunks))
+        finally:
+            await chunk_queue.put(None)
+
+    async def index_batch(batch: List[Document], completed: List[dict]):
+        await _run_when_available(embed_pool, rag_system.add_chunks, batch, completed)
+        progress.loaded.extend(e["filename"] for e in completed)
+        progress.chunks_indexed += len(batch)
+        progress.batches += 1
+        if on_batch is not None:
+            on_batch()
+
+    async def embed():
+        batch = []
+        # Archivos cuyo último chunk está en el lote en construcción
+        completed_in_batch = []
+        while True:
+            item = await chunk_queue.get()
+            if item is None:
+                break
+            entry, chunks = item
+            for i, chunk in enumerate(chunks):
+                batch.append(chunk)
+                if i == len(chunks) - 1:
+                    completed_in_batch.append(entry)
+                if len(batch) >= batch_size:
+                    await index_batch(batch, completed_in_batch)
+                    batch, completed_in_batch = [], []
+        if batch:
+            await index_batch(batch, completed_in_batch)
+        return progress.loaded
+
+    embed_task = asyncio.ensure_future(embed())
+    try:
+        await extract()
+    except BaseException:
+        embed_task.cancel()
+        raise
+    loaded = await embed_task
+    metrics.inc("rag_ingested_files_total", len(loaded))
+
+    return {"files": loaded, "skipped": skipped, "errors": errors}
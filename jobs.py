@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from ingestion import IngestProgress
+from workers import PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo; los dos últimos son finales
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+class IngestJob:
+    """Carga de archivos a una colección, procesada en segundo plano."""
+
+    def __init__(self, collection: str, files: List[Tuple[str, str, str]], job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.collection = collection
+        # (ruta, nombre, hash del archivo), como los recibe ingest_files
+        self.files = files
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Veces que se retomó tras un reinicio del servidor
+        self.resumed = 0
+        self.progress = IngestProgress()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> dict:
+        """Estado y avance del trabajo, tal como lo informa la API."""
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        progress = self.progress.to_dict()
+        return {
+            "id": self.id,
+            "collection": self.collection,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "resumed": self.resumed,
+            "files_total": len(self.files),
+            "files_done": len(progress["files"]) + len(progress["skipped"]) + len(progress["errors"]),
+            **progress,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "chunks_per_second": round(self.progress.chunks_indexed / elapsed, 1) if elapsed else None
+        }
+
+    def checkpoint(self) -> dict:
+        return {**self.to_dict(), "file_entries": self.files}
+
+    @classmethod
+    def from_checkpoint(cls, data: dict) -> "IngestJob":
+        job = cls(data["collection"], [tuple(entry) for entry in data["file_entries"]], data["id"])
+        job.status = data["status"]
+        job.error = data["error"]
+        job.created_at = data["created_at"]
+        job.started_at = data["started_at"]
+        job.finished_at = data["finished_at"]
+        job.resumed = data["resumed"]
+        progress = job.progress
+        progress.files_extracted = data["files_extracted"]
+        progress.chunks_extracted = data["chunks_extracted"]
+        progress.chunks_indexed = data["chunks_indexed"]
+        progress.batches = data["batches"]
+        progress.loaded = data["files"]
+        progress.skipped = data["skipped"]
+        progress.errors = data["errors"]
+        return job
+
+
+class JobManager:
+    """
+    Cola de trabajos de ingesta atendida por workers asíncronos.
+
+    runner procesa un trabajo y lanza una excepción si falla. Con directory,
+    cada trabajo se guarda como JSON al cambiar de estado y en cada checkpoint
+    (tras cada lote de embedding); al arrancar, los que no terminaron se
+    vuelven a encolar. Como los chunks ya indexados se omiten, retomar una
+    carga no vuelve a embeber lo guardado en la última instantánea.
+    """
+
+    def __init__(self, runner: Callable[[IngestJob], Awaitable[None]], directory: Optional[str] = None,
+                 workers: int = 1, max_pending: int = 32, keep_finished: int = 200):
+        self._runner = runner
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Retoma los trabajos guardados y lanza los workers; llamar desde el event loop."""
+        self._queue = asyncio.Queue()
+        for job in self._recover():
+            self._queue.put_nowait(job)
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Detiene los workers; los trabajos en curso se retoman al volver a arrancar."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, collection: str, files: List[Tuple[str, str, str]]) -> IngestJob:
+        """Encola una carga o lanza PoolSaturatedError si ya hay max_pending en espera."""
+        if self.pending() >= self.max_pending:
+            raise PoolSaturatedError("Hay demasiadas cargas en cola, intente más tarde")
+        job = IngestJob(collection, files)
+        self._jobs[job.id] = job
+        self.checkpoint(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self, collection: Optional[str] = None) -> List[IngestJob]:
+        """Trabajos conocidos, del más reciente al más antiguo."""
+        return [job for job in reversed(self._jobs.values()) if collection in (None, job.collection)]
+
+    def pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def checkpoint(self, job: IngestJob):
+        """Guarda el estado del trabajo (escritura atómica: archivo temporal y rename)."""
+        if self.directory is None:
+            return
+        path = self.directory / f"{job.id}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job.checkpoint(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _recover(self) -> List[IngestJob]:
+        """Carga los trabajos guardados y devuelve los que hay que retomar, en orden de creación."""
+        if self.directory is None:
+            return []
+        jobs = []
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    jobs.append(IngestJob.from_checkpoint(json.load(f)))
+            except (OSError, ValueError, KeyError):
+                logger.exception("Checkpoint de trabajo ilegible: %s", path)
+        jobs.sort(key=lambda job: job.created_at)
+
+        to_resume = []
+        for job in jobs:
+            self._jobs[job.id] = job
+            if not job.finished:
+                # Se empieza de nuevo: los archivos ya cargados se omiten como duplicados
+                job.status = QUEUED
+                job.resumed += 1
+                job.progress = IngestProgress()
+                to_resume.append(job)
+        self._prune()
+        return to_resume
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self.checkpoint(job)
+            try:
+                await self._runner(job)
+                job.status = COMPLETED
+            except asyncio.CancelledError:
+                # Servidor deteniéndose: queda "running" en disco y se retoma al arrancar
+                raise
+            except Exception as e:
+                logger.warning("Falló el trabajo de ingesta %s: %s", job.id, e)
+                job.status = FAILED
+                job.error = str(e)
+            job.finished_at = time.time()
+            self.checkpoint(job)
+            self._prune()
+
+    def _prune(self):
+        """Olvida los trabajos terminados más antiguos por encima de keep_finished."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+            if self.directory is not None:
+                (self.directory / f"{job_id}.json").unlink(missing_ok=True)
@@ -0,0 +1,170 @@
+import re
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Encabezados estructurales: inician un chunk nuevo (mismos que reconoce format_content)
+_ARTICLE_RE = re.compile(r'(?:Art[íi]culo|ART[ÍI]CULO)\s+(\d+[a-z]?)\s*\.')
+_SECTION_RE = re.compile(r'(?:CAP[ÍI]TULO|T[ÍI]TULO)\s+[IVXLCDM]+\b', re.IGNORECASE)
+# Cortes dentro de un artículo largo: parágrafos, incisos y fin de frase
+_BREAK_RE = re.compile(r'(?:Parágrafo\s*\d*\.|\n+|(?<=[.;:])\s+)', re.IGNORECASE)
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WORD_RE = re.compile(r'\S+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Tokens WordPiece aproximados de un texto para el tokenizador de MiniLM.
+
+    El vocabulario es inglés: las palabras en español se parten en varias
+    piezas (se cuenta una más cada 4 caracteres) y cada signo de puntuación
+    es un token. Se suman [CLS] y [SEP]. Tiende a sobrestimar, así el chunk
+    cabe en la ventana del modelo.
+    """
+    words = text.split()
+    characters = sum(map(len, words))
+    punctuation = len(_PUNCTUATION_RE.findall(text))
+    # Redondeo hacia arriba: la suma de las estimaciones de dos partes nunca es menor que la del total
+    return 2 + len(words) + punctuation + -(-(characters - punctuation) // 4)
+
+
+class LegalTextSplitter:
+    """
+    Divide textos legales en chunks por artículo, limitados en tokens.
+
+    Cada "Artículo N." (y cada CAPITULO o TITULO, que además cierra el chunk
+    anterior) empieza una unidad; las unidades consecutivas se agrupan en un
+    chunk mientras quepan en max_tokens, así un artículo nunca queda partido
+    si entra en la ventana del modelo. Los artículos más largos se dividen en
+    parágrafos, incisos o frases, y solo esos trozos se solapan: el siguiente
+    repite la última frase si no supera overlap_tokens. Cada chunk lleva en
+    sus metadatos los números de artículo que contiene.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32,
+                 length_function: Callable[[str], int] = estimate_tokens):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.length_function = length_function
+        # Tokens especiales de cada secuencia: el resto se suma por partes, porque el
+        # tokenizador nunca une palabras separadas por espacios
+        self._special = length_function("")
+        self._budget = max_tokens - self._special
+
+    def _tokens(self, text: str, start: int, end: int) -> int:
+        return self.length_function(text[start:end]) - self._special
+
+    def create_documents(self, texts: List[str]) -> List[Document]:
+        """Chunks de cada texto; start_index los ubica en su texto, como en los splitters de langchain."""
+        documents = []
+        for text in texts:
+            for start, end, articles in self.split_spans(text):
+                metadata = {"start_index": start}
+                if articles:
+                    metadata["articles"] = articles
+                documents.append(Document(page_content=text[start:end], metadata=metadata))
+        return documents
+
+    def split_spans(self, text: str) -> List[Tuple[int, int, List[str]]]:
+        """(inicio, fin, artículos) de cada chunk, sin espacios en los bordes."""
+        chunks = []
+        # Chunk en construcción: [inicio, fin, tokens, artículos, solo encabezados CAPITULO/TITULO]
+        current: Optional[list] = None
+
+        for start, end, article, is_section in self._units(text):
+            tokens = self._tokens(text, start, end)
+            if current is not None and is_section and not current[4]:
+                chunks.append((current[0], current[1], current[3]))
+                current = None
+            if current is not None:
+                if current[2] + tokens <= self._budget:
+                    current[1] = end
+                    current[2] += tokens
+                    if article and article not in current[3]:
+                        current[3].append(article)
+                    current[4] = current[4] and is_section
+                    continue
+                if current[4]:
+                    # Encabezados pendientes: van delante del artículo que sigue
+                    start = current[0]
+                    tokens += current[2]
+                else:
+                    chunks.append((current[0], current[1], current[3]))
+                current = None
+            if tokens <= self._budget:
+                current = [start, end, tokens, [article] if article else [], is_section]
+            else:
+                # Artículo más largo que la ventana: a trozos
+                chunks.extend((a, b, [article] if article else []) for a, b in self._split_long(text, start, end))
+        if current is not None:
+            chunks.append((current[0], current[1], current[3]))
+        return chunks
+
+    def _units(self, text: str) -> List[Tuple[int, int, Optional[str], bool]]:
+        """(inicio, fin, número de artículo, es CAPITULO/TITULO) de cada unidad estructural."""
+        headers = [(m.start(), m.group(1), False) for m in _ARTICLE_RE.finditer(text) if _at_line_start(text, m.start())]
+        headers += [(m.start(), None, True) for m in _SECTION_RE.finditer(text) if _at_line_start(text, m.start())]
+        headers.sort()
+        if not headers or headers[0][0] > 0:
+            headers.insert(0, (0, None, False))
+
+        units = []
+        for i, (start, article, is_section) in enumerate(headers):
+            end = headers[i + 1][0] if i + 1 < len(headers) else len(text)
+            span = _strip(text, start, end)
+            if span is not None:
+                units.append((*span, article, is_section))
+        return units
+
+    def _split_long(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Trozos de a lo sumo max_tokens, cortando en parágrafos, incisos o frases."""
+        header = _ARTICLE_RE.match(text, start)
+        # Sin cortar entre "Artículo N." y su texto
+        first_cut = header.end() if header else start
+        cuts = [start] + [m.start() if m.group().strip() else m.end()
+                          for m in _BREAK_RE.finditer(text, start, end) if first_cut < m.start()] + [end]
+        # (inicio, fin, tokens, es frase); una frase más larga que la ventana se reparte por palabras
+        parts = []
+        for a, b in zip(cuts, cuts[1:]):
+            span = _strip(text, a, b)
+            if span is None:
+                continue
+            tokens = self._tokens(text, *span)
+            if tokens <= self._budget:
+                parts.append((*span, tokens, True))
+            else:
+                parts.extend((m.start(), m.end(), self._tokens(text, m.start(), m.end()), False)
+                             for m in _WORD_RE.finditer(text, *span))
+
+        pieces = []
+        i = 0
+        while i < len(parts):
+            first = i
+            tokens = parts[i][2]
+            j = i + 1
+            while j < len(parts) and tokens + parts[j][2] <= self._budget:
+                tokens += parts[j][2]
+                j += 1
+            pieces.append((parts[first][0], parts[j - 1][1]))
+            # Solapamiento mínimo: el siguiente trozo repite la última frase si es corta
+            last = parts[j - 1]
+            overlap = last[3] and j - 1 > first and j < len(parts) and \
+                last[2] + self._special <= self.overlap_tokens and last[2] + parts[j][2] <= self._budget
+            i = j - 1 if overlap else j
+        return pieces
+
+
+def _at_line_start(text: str, position: int) -> bool:
+    """El encabezado empieza el texto, una línea o una frase (no es una cita como "el Artículo 5.")."""
+    i = position - 1
+    while i >= 0 and text[i] in ' \t':
+        i -= 1
+    return i < 0 or text[i] in '\n.:;'
+
+
+def _strip(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
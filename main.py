@@ -1,14 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+
+# Inicio del proceso: referencia para medir el arranque en frío hasta la primera consulta
+PROCESS_START = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
+import asyncio
+import hashlib
+import json
+import logging
 import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from rag_system import RAGSystem, DocumentProcessor
+from rag_system import RAGSystem
+from collection_manager import DEFAULT_COLLECTION, CollectionManager, validate_collection_name
+from embedding_cache import EmbeddingCache
+from embedding_models import LazyEmbeddings
+from ingestion import ingest_files
+from jobs import IngestJob, JobManager
+from metrics import metrics, server_timing
+from workers import PoolSaturatedError, create_process_pool, create_thread_pool
 
 # Cargar variables de entorno
 load_dotenv()
@@ -47,20 +66,350 @@ API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise ValueError("API_KEY no encontrada en variables de entorno")
 
-rag_system = RAGSystem(
-    api_key=API_KEY,
-    model_name=os.getenv("LLM_MODEL", "huggingface")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache") or None
+
+# Modelo de embeddings y caché de chunks compartidos por todas las colecciones. La caché
+# se separa por model_id: PyTorch, ONNX y ONNX int8 no producen exactamente los mismos vectores.
+shared_embeddings = LazyEmbeddings(
+    EMBEDDING_MODEL,
+    backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+    batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 32)),
+    threads=int(os.getenv("EMBEDDING_THREADS", 0)) or None,
+    onnx_dir=os.getenv("EMBEDDING_ONNX_DIR", "onnx_model"),
+    onnx_file=os.getenv("EMBEDDING_ONNX_FILE", "model.onnx")
+)
+shared_embedding_cache = (
+    EmbeddingCache(EMBEDDING_CACHE_DIR, shared_embeddings.model_id) if EMBEDDING_CACHE_DIR else None
+)
+
+
+def create_rag_system() -> RAGSystem:
+    """Sistema RAG de una colección."""
+    return RAGSystem(
+        api_key=API_KEY,
+        model_name=os.getenv("LLM_MODEL", "huggingface"),
+        cache_size=int(os.getenv("QUERY_CACHE_SIZE", 256)),
+        embedding_model=EMBEDDING_MODEL,
+        index_type=os.getenv("FAISS_INDEX_TYPE", "flat"),
+        ann_threshold=int(os.getenv("ANN_THRESHOLD", 50000)),
+        nlist=int(os.getenv("IVF_NLIST", 0)) or None,
+        search_params={
+            "nprobe": int(os.getenv("IVF_NPROBE", 16)),
+            "ef_search": int(os.getenv("HNSW_EF_SEARCH", 64))
+        },
+        embeddings=shared_embeddings,
+        embedding_cache=shared_embedding_cache,
+        vector_encoding=os.getenv("VECTOR_ENCODING", "float32"),
+        rescore=os.getenv("VECTOR_RESCORE", "true").lower() == "true"
+    )
+
+logger = logging.getLogger(__name__)
+
+# Arranque: el servidor acepta conexiones de inmediato y en segundo plano carga la
+# última instantánea del índice y precalienta el modelo de embeddings (ver /api/ready)
+PERSIST_VECTOR_STORE = os.getenv("PERSIST_VECTOR_STORE", "true").lower() == "true"
+startup_stats = {
+    "warm_start": False,
+    "index_load_seconds": None,
+    "model_load_seconds": None,
+    "time_to_first_query_seconds": None
+}
+startup_state = {"index_loaded": False, "model_ready": False, "model_error": None}
+
+# Colecciones de documentos, cada una con su índice en VECTOR_STORE_DIR/<nombre>. Las menos
+# usadas se guardan y se descargan de memoria al superar COLLECTIONS_MAX_RESIDENT colecciones
+# o COLLECTIONS_MEMORY_MB. Sin persistencia se descargan a un directorio temporal.
+COLLECTIONS_DIR = VECTOR_STORE_DIR if PERSIST_VECTOR_STORE else Path(tempfile.mkdtemp(prefix="collections-"))
+collections = CollectionManager(
+    create_rag_system,
+    str(COLLECTIONS_DIR),
+    max_resident=int(os.getenv("COLLECTIONS_MAX_RESIDENT", 8)),
+    memory_budget=int(float(os.getenv("COLLECTIONS_MEMORY_MB", 0)) * 2 ** 20) or None
+)
+
+
+def initialize():
+    """Carga la colección por defecto y precalienta el modelo; corre en un hilo al arrancar."""
+    if PERSIST_VECTOR_STORE:
+        load_start = time.perf_counter()
+        try:
+            # Índice único de versiones anteriores → colección por defecto
+            collections.migrate_single_index()
+        except OSError:
+            logger.exception("No se pudo migrar el índice guardado a la colección por defecto")
+        rag = collections.acquire(DEFAULT_COLLECTION)
+        collections.release(DEFAULT_COLLECTION)
+        startup_stats["warm_start"] = rag.vector_store is not None
+        startup_stats["index_load_seconds"] = round(time.perf_counter() - load_start, 3)
+    startup_state["index_loaded"] = True
+    
+    model_start = time.perf_counter()
+    try:
+        # El modelo es compartido por todas las colecciones: se precalienta directamente
+        shared_embeddings.embed_documents(["calentamiento del modelo de embeddings"])
+    except Exception as e:
+        # Las consultas reintentarán cargarlo; /api/ready informa el error
+        logger.exception("No se pudo cargar el modelo de embeddings")
+        startup_state["model_error"] = str(e)
+        return
+    startup_stats["model_load_seconds"] = round(time.perf_counter() - model_start, 3)
+    startup_state["model_ready"] = True
+
+
+def require_index():
+    """Responde 503 mientras el índice guardado se está cargando al arrancar."""
+    if not startup_state["index_loaded"]:
+        raise HTTPException(
+            status_code=503,
+            detail="El sistema se está iniciando, intente en unos segundos",
+            headers={"Retry-After": os.getenv("RETRY_AFTER_SECONDS", "1")}
+        )
+
+
+def collection_name(name: str) -> str:
+    """Valida el nombre de colección recibido en la petición (400 si es inválido)."""
+    try:
+        return validate_collection_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def collection_upload_dir(name: str) -> Path:
+    """Archivos subidos de la colección; los de la colección por defecto quedan en uploads/."""
+    return UPLOAD_DIR if name == DEFAULT_COLLECTION else UPLOAD_DIR / name
+
+# Pools de trabajo: las consultas y los embeddings van a hilos, la extracción de texto a procesos.
+# Cuando un pool alcanza su cupo de tareas pendientes se responde 503 en vez de encolar.
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", 4))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 1))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+query_pool = create_thread_pool(
+    "query",
+    max_workers=QUERY_WORKERS,
+    max_pending=int(os.getenv("QUERY_QUEUE_SIZE", QUERY_WORKERS * 8))
+)
+# Los embeddings de las cargas tienen su propio pool para no ocupar cupos de consultas
+embed_pool = create_thread_pool(
+    "embed",
+    max_workers=EMBED_WORKERS,
+    max_pending=int(os.getenv("EMBED_QUEUE_SIZE", EMBED_WORKERS * 2))
 )
+ingest_pool = create_process_pool(
+    "ingest",
+    max_workers=INGEST_WORKERS,
+    max_pending=int(os.getenv("INGEST_QUEUE_SIZE", INGEST_WORKERS * 4))
+)
+
+# Chunks por lote de embedding durante la ingesta en pipeline
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+
+# Segundos mínimos entre instantáneas de una colección durante una carga (cada una
+# reescribe el índice completo); al terminar la carga siempre se guarda una
+JOB_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("JOB_SNAPSHOT_INTERVAL_SECONDS", 60))
+
+# Preguntas máximas por petición a /api/query/batch
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", 1000))
+
+# Texto extraído de cada página de PDF en disco; sobrevive a reinicios y a reset()
+PAGE_TEXT_CACHE_DIR = os.getenv("PAGE_TEXT_CACHE_DIR", "text_cache") or None
+
+# Desglose de tiempos por etapa en la respuesta cuando el cliente envía X-Debug-Timings: 1
+DEBUG_TIMINGS = os.getenv("DEBUG_TIMINGS", "true").lower() == "true"
+
+
+# Instantáneas de cada colección en un hilo propio; las peticiones durante una escritura se agrupan.
+# Las cargas en segundo plano obtienen su colección en este mismo hilo.
+snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+snapshot_state: Dict[str, dict] = {}
+
+
+async def acquire_collection(name: str, create: bool = True) -> RAGSystem:
+    """
+    RAGSystem de la colección, cargado de disco en el pool de consultas si no
+    está en memoria; liberar con collections.release. Con create=False responde
+    404 si la colección no existe.
+    """
+    require_index()
+    try:
+        return await query_pool.run(collections.acquire, name, create)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"La colección '{name}' no existe")
+
+
+def query_collection(name: str, method: str, *args):
+    """
+    Ejecuta method del RAGSystem de la colección midiendo sus etapas (ver
+    timed_call). Corre en el pool de consultas: la carga desde disco, si hace
+    falta, no bloquea el event loop.
+    """
+    try:
+        rag = collections.acquire(name, create=False)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"La colección '{name}' no existe")
+    try:
+        if rag.vector_store is None:
+            raise HTTPException(
+                status_code=400,
+                detail="No hay documentos cargados. Por favor, cargue documentos primero."
+            )
+        return timed_call(getattr(rag, method), *args)
+    finally:
+        collections.release(name)
+
+
+def schedule_snapshot(name: str):
+    """Programa una instantánea de la colección sin bloquear la petición en curso."""
+    if not PERSIST_VECTOR_STORE:
+        return
+    state = snapshot_state.setdefault(name, {"running": False, "dirty": False})
+    if state["running"]:
+        state["dirty"] = True
+        return
+    state["running"] = True
+    future = asyncio.get_running_loop().run_in_executor(snapshot_executor, collections.save, name)
+    future.add_done_callback(lambda done: _snapshot_done(name, done))
+
+
+def _snapshot_done(name: str, future: asyncio.Future):
+    state = snapshot_state[name]
+    state["running"] = False
+    if future.exception():
+        logger.error("Error guardando la instantánea de la colección %s", name, exc_info=future.exception())
+    if state["dirty"]:
+        state["dirty"] = False
+        schedule_snapshot(name)
+
+
+async def run_ingest_job(job: IngestJob):
+    """Extrae, divide y embebe los archivos de una carga; cada lote es consultable al terminar."""
+    # Los trabajos retomados al arrancar esperan a que termine initialize
+    while not startup_state["index_loaded"]:
+        await asyncio.sleep(0.1)
+    rag = await asyncio.get_running_loop().run_in_executor(snapshot_executor, collections.acquire, job.collection)
+    last_snapshot = time.monotonic()
+    
+    def checkpoint():
+        nonlocal last_snapshot
+        if time.monotonic() - last_snapshot >= JOB_SNAPSHOT_INTERVAL_SECONDS:
+            last_snapshot = time.monotonic()
+            schedule_snapshot(job.collection)
+        ingest_jobs.checkpoint(job)
+    
+    try:
+        # Extraer en paralelo y embeber en lotes a medida que terminan las extracciones
+        result = await ingest_files(
+            rag,
+            job.files,
+            extract_pool=ingest_pool,
+            embed_pool=embed_pool,
+            batch_size=EMBED_BATCH_SIZE,
+            text_cache_dir=PAGE_TEXT_CACHE_DIR,
+            progress=job.progress,
+            on_batch=checkpoint
+        )
+    finally:
+        collections.release(job.collection)
+        # Los lotes posteriores a la última instantánea
+        schedule_snapshot(job.collection)
+    
+    if not result["files"] and not result["skipped"]:
+        raise ValueError("; ".join(result["errors"].values()) or "No se pudo procesar ningún archivo")
+
+
+# Cargas en segundo plano: /api/upload responde con el id del trabajo en cuanto guarda los
+# archivos. Con persistencia, cada trabajo se guarda en JOBS_DIR tras cada lote de embedding
+# y los que no terminaron se retoman al reiniciar el servidor.
+ingest_jobs = JobManager(
+    run_ingest_job,
+    os.getenv("JOBS_DIR", "jobs") if PERSIST_VECTOR_STORE else None,
+    workers=int(os.getenv("INGEST_JOB_WORKERS", 1)),
+    max_pending=int(os.getenv("INGEST_JOB_QUEUE_SIZE", 32))
+)
+
+
+def wants_timings(request: Request) -> bool:
+    """El cliente pidió el desglose de tiempos y el servidor lo permite."""
+    return DEBUG_TIMINGS and request.headers.get("X-Debug-Timings", "").lower() in ("1", "true")
+
+
+def timed_call(fn, *args):
+    """Ejecuta fn en el hilo actual y devuelve su resultado con los segundos por etapa."""
+    start = time.perf_counter()
+    with metrics.collect_stages() as stages:
+        result = fn(*args)
+    stages["total"] = time.perf_counter() - start
+    return result, stages
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Duración de cada petición por ruta (en streaming, hasta enviar las cabeceras)."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe(
+        "rag_request_seconds",
+        time.perf_counter() - start,
+        endpoint=getattr(route, "path", "other"),
+        method=request.method
+    )
+    return response
+
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    """Responde con backpressure cuando los pools de trabajo están llenos."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": os.getenv("RETRY_AFTER_SECONDS", "1")}
+    )
+
+
+@app.on_event("startup")
+async def start_initialization():
+    """Lanza la carga del índice y del modelo, y los workers de carga, sin retrasar el arranque."""
+    threading.Thread(target=initialize, name="startup", daemon=True).start()
+    ingest_jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    """
+    Detiene las cargas en curso (se retoman al arrancar), libera los pools de
+    trabajo y guarda las colecciones con cambios al detener el servidor.
+    """
+    await ingest_jobs.stop()
+    query_pool.shutdown()
+    embed_pool.shutdown()
+    ingest_pool.shutdown()
+    snapshot_executor.shutdown(wait=True)
+    if PERSIST_VECTOR_STORE:
+        collections.save_all()
+    else:
+        shutil.rmtree(COLLECTIONS_DIR, ignore_errors=True)
 
 # Modelos Pydantic
 class QueryRequest(BaseModel):
     question: str
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[dict]
     confidence: str
 
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[QueryResponse]
+
 class StatusResponse(BaseModel):
     status: str
     documents_loaded: List[str]
@@ -75,106 +424,311 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Verifica el estado del sistema."""
+    """Liveness: el proceso responde, aunque el índice o el modelo sigan cargando."""
     return {
         "status": "healthy",
         "model": os.getenv("LLM_MODEL", "huggingface"),
-        "documents_loaded": len(rag_system.documents_loaded)
+        "embeddings": shared_embeddings.model_id,
+        "startup": startup_stats,
+        "collections": collections.stats(),
+        "chunk_embedding_cache": shared_embedding_cache.stats() if shared_embedding_cache else None,
+        "pools": {
+            "query": query_pool.stats(),
+            "embed": embed_pool.stats(),
+            "ingest": ingest_pool.stats()
+        },
+        "ingest_jobs_queued": ingest_jobs.pending()
     }
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness: 200 cuando el índice está cargado y el modelo de embeddings precalentado, si no 503."""
+    ready = startup_state["index_loaded"] and startup_state["model_ready"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, **startup_state, "startup": startup_stats}
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencias por etapa, contadores,
+    y el índice y las cachés de cada colección en memoria.
+    """
+    resident = collections.resident_items()
+    stats = collections.stats()
+    gauges = [("rag_collections_resident", "Colecciones en memoria", {}, len(resident))]
+    counters = [
+        ("rag_collection_loads_total", "Colecciones cargadas de disco", {}, stats["loads"]),
+        ("rag_collection_evictions_total", "Colecciones descargadas de memoria", {}, stats["evictions"]),
+    ]
+    for name, rag in resident:
+        index = rag.index_stats()
+        labels = {"collection": name}
+        gauges += [
+            ("rag_index_chunks", "Chunks en el índice FAISS", labels, index["chunks"]),
+            ("rag_sparse_chunks", "Chunks en el índice BM25", labels, index["sparse_chunks"]),
+            ("rag_documents_loaded", "Documentos cargados", labels, len(rag.documents_loaded)),
+            ("rag_index_version", "Versión del índice (cambia con cada modificación)", labels, rag.index_version),
+            ("rag_collection_memory_bytes", "Memoria estimada de la colección", labels, rag.memory_estimate()),
+        ]
+    named_caches = {}
+    for name, rag in resident:
+        caches = rag.cache_stats()
+        for cache in ("embeddings", "results"):
+            named_caches[(name, cache)] = caches[cache]
+    if shared_embedding_cache is not None:
+        named_caches[(None, "chunk_embeddings")] = shared_embedding_cache.stats()
+    for field, help_text in (("hits", "Aciertos de la caché"), ("misses", "Fallos de la caché"),
+                             ("hit_rate", "Tasa de aciertos de la caché")):
+        for (name, cache), cache_stats in named_caches.items():
+            labels = {"cache": cache} if name is None else {"cache": cache, "collection": name}
+            gauges.append((f"rag_cache_{field}", help_text, labels, cache_stats[field]))
+    for field, help_text in (("in_flight", "Tareas en curso en el pool"),
+                             ("rejected", "Tareas rechazadas por pool saturado")):
+        for name, pool in (("query", query_pool), ("embed", embed_pool), ("ingest", ingest_pool)):
+            gauges.append((f"rag_pool_{field}", help_text, {"pool": name}, pool.stats()[field]))
+    gauges.append(("rag_ingest_jobs_queued", "Cargas en cola esperando un worker", {}, ingest_jobs.pending()))
+    return PlainTextResponse(metrics.render(gauges, counters), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/upload")
-async def upload_documents(files: List[UploadFile] = File(...)):
+async def upload_documents(files: List[UploadFile] = File(...), collection: str = DEFAULT_COLLECTION):
     """
-    Carga y procesa uno o varios documentos.
+    Guarda uno o varios documentos y encola su procesamiento en una colección
+    (se crea si no existe). Responde 202 con el id del trabajo, cuyo avance se
+    consulta en /api/jobs/{id}; los chunks son consultables a medida que se indexan.
     Formatos soportados: PDF, DOCX, TXT
     """
     if not files:
         raise HTTPException(status_code=400, detail="No se enviaron archivos")
+    collection = collection_name(collection)
+    require_index()
+    
+    # Validar todas las extensiones antes de guardar o procesar nada
+    for file in files:
+        extension = Path(file.filename).suffix.lower()
+        if extension not in ['.pdf', '.docx', '.txt']:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Formato no soportado: {extension}. Use PDF, DOCX o TXT"
+            )
     
-    processed_files = []
-    texts = []
-    metadatas = []
+    if ingest_jobs.pending() >= ingest_jobs.max_pending:
+        raise PoolSaturatedError("Hay demasiadas cargas en cola, intente más tarde")
     
     try:
+        upload_dir = collection_upload_dir(collection)
+        upload_dir.mkdir(exist_ok=True)
+        saved_files = []
         for file in files:
-            # Validar extensión
+            # Guardar archivo temporalmente calculando su hash para deduplicar
             filename = file.filename
-            extension = Path(filename).suffix.lower()
-            
-            if extension not in ['.pdf', '.docx', '.txt']:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Formato no soportado: {extension}. Use PDF, DOCX o TXT"
-                )
-            
-            # Guardar archivo temporalmente
-            file_path = UPLOAD_DIR / filename
+            file_path = upload_dir / filename
+            file_hash = hashlib.sha256()
             with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Procesar documento
-            text = DocumentProcessor.process_document(str(file_path), filename)
-            
-            if not text.strip():
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"El archivo {filename} está vacío o no se pudo leer"
-                )
-            
-            texts.append(text)
-            metadatas.append({"filename": filename})
-            processed_files.append(filename)
-            
-        
-        # Añadir documentos al sistema RAG
-        rag_system.add_documents(texts, metadatas)
-        
-        return {
-            "status": "success",
-            "message": f"Se cargaron {len(processed_files)} documento(s) exitosamente",
-            "files": processed_files,
-            "total_documents": len(rag_system.documents_loaded)
+                while block := file.file.read(1024 * 1024):
+                    file_hash.update(block)
+                    buffer.write(block)
+            saved_files.append((str(file_path), filename, file_hash.hexdigest()))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error guardando documentos: {str(e)}")
+    
+    # La extracción y el embedding siguen en segundo plano (ver run_ingest_job)
+    job = ingest_jobs.submit(collection, saved_files)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "message": f"{len(saved_files)} documento(s) en cola de procesamiento",
+            "job_id": job.id,
+            "job_url": f"/api/jobs/{job.id}",
+            "collection": collection
         }
+    )
+
+
+@app.get("/api/jobs")
+async def list_jobs(collection: Optional[str] = None):
+    """Cargas recientes, de la más nueva a la más antigua."""
+    return {"jobs": [job.to_dict() for job in ingest_jobs.list(collection)]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Estado de una carga: archivos y chunks procesados, rendimiento en chunks
+    por segundo, y al terminar los documentos cargados, omitidos y con error.
+    """
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"El trabajo '{job_id}' no existe")
+    return job.to_dict()
+
+
+@app.post("/api/query", response_model=QueryResponse)
+async def query_documents(request: QueryRequest, http_request: Request, response: Response,
+                          collection: str = DEFAULT_COLLECTION):
+    """
+    Realiza una consulta sobre los documentos cargados en la colección.
+    
+    Con la cabecera X-Debug-Timings: 1 la respuesta incluye Server-Timing con
+    los milisegundos de cada etapa.
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía")
+    
+    collection = collection_name(collection)
+    require_index()
+    try:
+        result, stages = await query_pool.run(
+            query_collection,
+            collection,
+            "query",
+            request.question,
+            {"nprobe": request.nprobe, "ef_search": request.ef_search}
+        )
+        if wants_timings(http_request):
+            response.headers["Server-Timing"] = server_timing(stages)
+        if startup_stats["time_to_first_query_seconds"] is None:
+            startup_stats["time_to_first_query_seconds"] = round(time.perf_counter() - PROCESS_START, 3)
+        return QueryResponse(**result)
     
-    except HTTPException:
+    except (HTTPException, PoolSaturatedError):
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error procesando documentos: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error procesando consulta: {str(e)}")
 
 
-@app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+@app.post("/api/query/batch", response_model=BatchQueryResponse)
+async def query_documents_batch(request: BatchQueryRequest, http_request: Request, response: Response,
+                                collection: str = DEFAULT_COLLECTION):
     """
-    Realiza una consulta sobre los documentos cargados.
+    Responde una lista de preguntas en una sola petición, en el mismo orden.
+    
+    Pensado para evaluaciones masivas: las preguntas se embeben en lote y se
+    buscan con una sola llamada a FAISS en lugar de una petición por pregunta.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="La lista de preguntas está vacía")
+    
+    if len(request.questions) > QUERY_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {QUERY_BATCH_MAX} preguntas por petición"
+        )
+    
+    empty = [i for i, question in enumerate(request.questions) if not question.strip()]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Preguntas vacías en las posiciones: {empty}")
+    
+    collection = collection_name(collection)
+    require_index()
+    try:
+        results, stages = await query_pool.run(
+            query_collection,
+            collection,
+            "query_batch",
+            request.questions,
+            {"nprobe": request.nprobe, "ef_search": request.ef_search}
+        )
+        if wants_timings(http_request):
+            response.headers["Server-Timing"] = server_timing(stages)
+        return BatchQueryResponse(results=[QueryResponse(**result) for result in results])
+    
+    except (HTTPException, PoolSaturatedError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error procesando consultas: {str(e)}")
+
+
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest, http_request: Request,
+                                 collection: str = DEFAULT_COLLECTION):
+    """
+    Consulta con respuesta en streaming (NDJSON, un evento JSON por línea).
+    
+    Envía primero las fuentes y la confianza en cuanto termina la recuperación,
+    luego cada fragmento de la respuesta a medida que se formatea, y al final
+    {"event": "done"} o {"event": "error"}. Con la cabecera X-Debug-Timings: 1,
+    el evento done incluye los milisegundos de cada etapa.
     """
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía")
     
-    if rag_system.vector_store is None:
+    collection = collection_name(collection)
+    rag = await acquire_collection(collection, create=False)
+    if rag.vector_store is None:
+        collections.release(collection)
         raise HTTPException(
             status_code=400,
             detail="No hay documentos cargados. Por favor, cargue documentos primero."
         )
     
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    search_params = {"nprobe": request.nprobe, "ef_search": request.ef_search}
+    debug = wants_timings(http_request)
+    
+    def stream():
+        for event in rag.query_stream(request.question, search_params):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    def produce():
+        try:
+            _, stages = timed_call(stream)
+            done = {"event": "done"}
+            if debug:
+                done["timings_ms"] = {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()}
+            loop.call_soon_threadsafe(events.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(
+                events.put_nowait, {"event": "error", "detail": f"Error procesando consulta: {str(e)}"}
+            )
+        finally:
+            collections.release(collection)
+            loop.call_soon_threadsafe(events.put_nowait, None)
+    
+    # Un solo envío al pool: si está saturado se responde 503 antes de empezar el stream
     try:
-        result = rag_system.query(request.question)
-        return QueryResponse(**result)
+        query_pool.submit(produce)
+    except PoolSaturatedError:
+        collections.release(collection)
+        raise
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error procesando consulta: {str(e)}")
+    async def body():
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            if event["event"] == "sources" and startup_stats["time_to_first_query_seconds"] is None:
+                startup_stats["time_to_first_query_seconds"] = round(time.perf_counter() - PROCESS_START, 3)
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        # Evitar que proxies intermedios acumulen la respuesta
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.post("/api/reset")
-async def reset_system():
+async def reset_system(collection: str = DEFAULT_COLLECTION):
     """
-    Reinicia el sistema, eliminando todos los documentos cargados.
+    Reinicia una colección, eliminando sus documentos cargados.
     """
+    collection = collection_name(collection)
+    rag = await acquire_collection(collection, create=False)
     try:
-        rag_system.reset()
+        rag.reset()
+        schedule_snapshot(collection)
         
         # Limpiar archivos subidos
-        for file in UPLOAD_DIR.glob("*"):
+        upload_dir = collection_upload_dir(collection)
+        for file in upload_dir.glob("*"):
             if file.is_file():
                 file.unlink()
         
@@ -185,23 +739,62 @@ async def reset_system():
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reiniciando sistema: {str(e)}")
+    finally:
+        collections.release(collection)
 
 
 @app.get("/api/status", response_model=StatusResponse)
-async def get_status():
+async def get_status(collection: str = DEFAULT_COLLECTION):
     """
-    Obtiene el estado actual del sistema.
+    Obtiene el estado actual de una colección.
     """
-    has_documents = rag_system.vector_store is not None
+    collection = collection_name(collection)
+    if not startup_state["index_loaded"]:
+        return StatusResponse(
+            status="starting",
+            documents_loaded=[],
+            message="Cargando documentos guardados..."
+        )
+    
+    try:
+        rag = await acquire_collection(collection, create=False)
+    except HTTPException as e:
+        if e.status_code != 404:
+            raise
+        documents_loaded = []
+    else:
+        documents_loaded = list(rag.documents_loaded) if rag.vector_store is not None else []
+        collections.release(collection)
+    has_documents = bool(documents_loaded)
     
     return StatusResponse(
         status="ready" if has_documents else "waiting_for_documents",
-        documents_loaded=rag_system.documents_loaded,
-        message=f"{len(rag_system.documents_loaded)} documento(s) cargado(s)" if has_documents 
+        documents_loaded=documents_loaded,
+        message=f"{len(documents_loaded)} documento(s) cargado(s)" if has_documents 
                 else "No hay documentos cargados"
     )
 
 
+@app.get("/api/collections")
+async def list_collections():
+    """
+    Lista las colecciones existentes; las que están en memoria incluyen su
+    tamaño y memoria estimada.
+    """
+    stats = collections.stats()
+    return {
+        "collections": [
+            {"name": name, "resident": name in stats["resident"], **stats["resident"].get(name, {})}
+            for name in collections.names()
+        ],
+        "default": DEFAULT_COLLECTION,
+        "max_resident": stats["max_resident"],
+        "memory_budget_mb": stats["memory_budget_mb"],
+        "loads": stats["loads"],
+        "evictions": stats["evictions"]
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,170 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Límites superiores (segundos) de los buckets de los histogramas de latencia
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Descripción de las métricas propias; los gauges traen la suya al exportarse
+HELP = {
+    "rag_stage_seconds": "Duración de cada etapa de consulta o ingesta",
+    "rag_request_seconds": "Duración de cada petición a la API",
+    "rag_queries_total": "Preguntas recibidas por el sistema RAG",
+    "rag_indexed_chunks_total": "Chunks nuevos añadidos al índice",
+    "rag_ingested_files_total": "Archivos cargados en el índice",
+    "rag_ingest_errors_total": "Archivos que no se pudieron procesar",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Histograma de buckets fijos con suma y conteo, como los de Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # Observaciones por bucket (no acumuladas); las mayores al último solo cuentan en count
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas en memoria, exportables en formato de texto de Prometheus.
+
+    stage() mide una etapa y la registra en el histograma rag_stage_seconds;
+    dentro de collect_stages() también se acumula en un desglose por hilo que
+    se puede devolver con la respuesta de cada petición.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Registra un valor en el histograma name con las etiquetas dadas."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        """Incrementa el contador name con las etiquetas dadas."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def record_stage(self, stage: str, seconds: float, pipeline: str = "query"):
+        """Registra la duración de una etapa medida en otro lugar (p. ej. en un proceso hijo)."""
+        self.observe("rag_stage_seconds", seconds, pipeline=pipeline, stage=stage)
+        breakdown = getattr(self._local, "stages", None)
+        if breakdown is not None:
+            breakdown[stage] = breakdown.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str, pipeline: str = "query") -> Iterator[None]:
+        """Mide el bloque como una etapa de la consulta o la ingesta."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, pipeline)
+
+    @contextmanager
+    def collect_stages(self) -> Iterator[Dict[str, float]]:
+        """Acumula en un diccionario los segundos por etapa medidos en este hilo."""
+        previous = getattr(self._local, "stages", None)
+        stages: Dict[str, float] = {}
+        self._local.stages = stages
+        try:
+            yield stages
+        finally:
+            self._local.stages = previous
+
+    def render(self, gauges: Iterable[Tuple[str, str, Dict[str, str], float]] = (),
+               counters: Iterable[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+        """
+        Texto en formato de exposición de Prometheus.
+
+        gauges son valores instantáneos calculados al exportar, como
+        (nombre, descripción, etiquetas, valor); counters, con la misma forma,
+        son totales acumulados que se llevan en otro lugar (p. ej. la caché de
+        colecciones). Las muestras de cada familia se agrupan bajo su TYPE.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        _render_families(lines, counters, "counter")
+        _render_families(lines, gauges, "gauge")
+        return "\n".join(lines) + "\n"
+
+
+def server_timing(stages: Dict[str, float]) -> str:
+    """Desglose por etapa como cabecera Server-Timing (milisegundos)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items())
+
+
+def _render_families(lines: List[str], samples: Iterable[Tuple[str, str, Dict[str, str], float]], kind: str):
+    """Agrega las muestras agrupadas por nombre, con un solo HELP y TYPE por familia."""
+    families: Dict[str, Tuple[str, List[str]]] = {}
+    for name, help_text, labels, value in samples:
+        family = families.setdefault(name, (help_text, []))
+        family[1].append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+    for name, (help_text, family_lines) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(family_lines)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    """Escapa barras, comillas y saltos de línea en el valor de una etiqueta."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Registro del proceso, compartido por el sistema RAG, la ingesta y la API
+metrics = MetricsRegistry()
@@ -0,0 +1,205 @@
+import copy
+import json
+import mmap
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Collection, Dict, Iterator, List, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+# Formato en disco de un vector store (sin pickle):
+#   index.faiss            índice FAISS, se abre con memory-map de solo lectura
+#   docstore.jsonl         un registro JSON por chunk, en el orden del índice
+#   docstore.offsets.npy   int64[n + 1], byte de inicio de cada registro
+#   ids.npy                ids de docstore de ancho fijo, en el orden del índice
+#   ids_order.npy          permutación que ordena ids.npy, para búsqueda binaria
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.jsonl"
+OFFSETS_FILE = "docstore.offsets.npy"
+IDS_FILE = "ids.npy"
+IDS_ORDER_FILE = "ids_order.npy"
+
+
+class MmapDocstore(Docstore, AddableMixin):
+    """
+    Docstore de solo lectura sobre archivos con memory-map.
+
+    Los procesos que abren la misma instantánea comparten las páginas de texto.
+    Los chunks añadidos después de cargar viven en memoria y los eliminados se
+    marcan como borrados; la siguiente instantánea los consolida.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        path = Path(path)
+        self.ids = np.load(path / IDS_FILE, mmap_mode="r")
+        self._order = np.load(path / IDS_ORDER_FILE, mmap_mode="r")
+        self._offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+
+        self._file = open(path / DOCSTORE_FILE, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self.ids) else b""
+
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+
+    def copy(self) -> "MmapDocstore":
+        """Copia que comparte los archivos en memory-map; los cambios posteriores no la afectan."""
+        clone = copy.copy(self)
+        clone._added = dict(self._added)
+        clone._deleted = set(self._deleted)
+        return clone
+
+    @property
+    def added_count(self) -> int:
+        """Chunks añadidos después de cargar, que viven en memoria."""
+        return len(self._added)
+
+    def _row(self, doc_id: str) -> Optional[int]:
+        """Fila de un id en disco mediante búsqueda binaria sobre ids ordenados."""
+        key = doc_id.encode("ascii")
+        lo, hi = 0, len(self._order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ids[self._order[mid]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._order) and self.ids[self._order[lo]] == key:
+            return int(self._order[lo])
+        return None
+
+    def _exists(self, doc_id: str) -> bool:
+        if doc_id in self._added:
+            return True
+        return doc_id not in self._deleted and self._row(doc_id) is not None
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._added:
+            return self._added[search]
+        row = None if search in self._deleted else self._row(search)
+        if row is None:
+            return f"ID {search} not found."
+
+        record = json.loads(self._data[int(self._offsets[row]):int(self._offsets[row + 1])])
+        return Document(id=search, page_content=record["page_content"], metadata=record["metadata"])
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = [doc_id for doc_id in texts if self._exists(doc_id)]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids: List) -> None:
+        missing = [doc_id for doc_id in ids if not self._exists(doc_id)]
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not  exist: {missing}")
+        for doc_id in ids:
+            if self._added.pop(doc_id, None) is None:
+                self._deleted.add(doc_id)
+
+
+class MmapIdMap(MutableMapping):
+    """index_to_docstore_id sobre el arreglo de ids en disco más las filas añadidas en memoria."""
+
+    def __init__(self, ids: np.ndarray):
+        self._ids = ids
+        self._added: Dict[int, str] = {}
+
+    def copy(self) -> "MmapIdMap":
+        clone = MmapIdMap(self._ids)
+        clone._added = dict(self._added)
+        return clone
+
+    def __getitem__(self, index: int) -> str:
+        index = int(index)
+        if index in self._added:
+            return self._added[index]
+        if 0 <= index < len(self._ids):
+            return self._ids[index].decode("ascii")
+        raise KeyError(index)
+
+    def __setitem__(self, index: int, doc_id: str):
+        index = int(index)
+        if index < len(self._ids):
+            raise KeyError(f"La fila {index} está en disco y es de solo lectura")
+        self._added[index] = doc_id
+
+    def __delitem__(self, index: int):
+        raise KeyError(f"No se pueden eliminar filas de {type(self).__name__}")
+
+    def __iter__(self) -> Iterator[int]:
+        yield from range(len(self._ids))
+        yield from sorted(self._added)
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._added)
+
+
+def freeze_store(vector_store: "FAISS", copy_index: bool = True) -> "FAISS":
+    """
+    Copia de un vector store para escribirla con write_store sin bloquear a
+    quien lo modifica. El índice se clona (copy_index=False lo comparte, si
+    nadie lo modifica en el lugar) y el docstore y el mapeo de ids se copian
+    superficialmente: los Document no cambian después de añadirse.
+    """
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    index = faiss.clone_index(vector_store.index) if copy_index else vector_store.index
+    docstore = vector_store.docstore
+    if isinstance(docstore, MmapDocstore):
+        docstore = docstore.copy()
+    else:
+        docstore = InMemoryDocstore(dict(docstore._dict))
+    id_map = vector_store.index_to_docstore_id
+    id_map = id_map.copy() if isinstance(id_map, MmapIdMap) else dict(id_map)
+    return FAISS(vector_store.embedding_function, index, docstore, id_map)
+
+
+def write_store(path: Union[str, Path], vector_store: "FAISS", deleted_rows: Collection[int] = ()):
+    """
+    Escribe el índice, los textos y los ids de un vector store en path.
+
+    deleted_rows son filas eliminadas que siguen en un índice aproximado: se
+    guardan con id y texto vacíos.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(vector_store.index, str(path / INDEX_FILE))
+
+    n = vector_store.index.ntotal
+    ids = ["" if i in deleted_rows else vector_store.index_to_docstore_id[i] for i in range(n)]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    with open(path / DOCSTORE_FILE, "wb") as f:
+        position = 0
+        for i, doc_id in enumerate(ids):
+            doc = vector_store.docstore.search(doc_id) if doc_id else Document(page_content="")
+            record = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False)
+            line = record.encode("utf-8") + b"\n"
+            f.write(line)
+            position += len(line)
+            offsets[i + 1] = position
+
+    ids_array = np.array(ids, dtype=np.bytes_) if ids else np.zeros(0, dtype="S1")
+    np.save(path / OFFSETS_FILE, offsets)
+    np.save(path / IDS_FILE, ids_array)
+    np.save(path / IDS_ORDER_FILE, np.argsort(ids_array, kind="stable"))
+
+
+def read_store(path: Union[str, Path], embeddings: Embeddings) -> "FAISS":
+    """Abre un vector store escrito con write_store sin copiarlo a memoria."""
+    from langchain_community.vectorstores import FAISS
+    path = Path(path)
+    index = faiss.read_index(str(path / INDEX_FILE), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    docstore = MmapDocstore(path)
+    return FAISS(embeddings, index, docstore, MmapIdMap(docstore.ids))
+
+
+def materialize_index(index):
+    """Copia a memoria un índice abierto con memory-map para poder modificarlo."""
+    return faiss.deserialize_index(faiss.serialize_index(index))
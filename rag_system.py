@@ -1,72 +1,494 @@
 import os
-from typing import List, Optional
+import copy
+import hashlib
+import json
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
 from pathlib import Path
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import numpy as np
+import faiss
 from langchain_core.documents import Document
-from pypdf import PdfReader
-import docx
-import pickle
+from langchain_core.embeddings import Embeddings
+from embedding_cache import EmbeddingCache
+from embedding_models import LazyEmbeddings
+from text_cache import PageTextCache
+from mmap_store import MmapDocstore, freeze_store, materialize_index, read_store, write_store
+from ann_index import (
+    INDEX_TYPES, VECTOR_ENCODINGS, build_ann_index, build_compact_index, bytes_per_vector,
+    calibrate_distance_offset, deleted_rows_selector, is_quantized, min_training_size, search_parameters
+)
+from sparse_index import BM25Index
+from legal_splitter import LegalTextSplitter
+from metrics import metrics
+from file_lock import file_lock
+
+# Dependencias pesadas (FAISS de langchain, pypdf, python-docx, modelo de
+# embeddings) se importan al usarlas para que el servidor arranque en menos de un segundo
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+# Directorio del índice BM25 dentro de un directorio de vector store
+SPARSE_INDEX_DIR = "bm25"
+
+# Lock entre procesos para escribir, publicar y limpiar instantáneas en un directorio
+SNAPSHOT_LOCK_FILE = "snapshot.lock"
+
+# Codificación de los vectores y desfase de distancias del índice cuantizado
+QUANTIZATION_FILE = "quantization.json"
+
+# Fracción de filas eliminadas de un índice aproximado a partir de la cual se reconstruye sin ellas
+TOMBSTONE_PURGE_FRACTION = 0.1
+
+# Caracteres acumulados antes de dividir un documento que llega por partes.
+# Los documentos más cortos se dividen igual que si se leyeran completos.
+STREAM_WINDOW_CHARS = 200000
+
+# Tamaño máximo de un chunk en tokens: la ventana de all-MiniLM-L6-v2, que trunca lo
+# que sobra. Solo los trozos de un artículo más largo que eso se solapan, en una frase corta.
+CHUNK_MAX_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 32
+
+# Memoria aproximada por chunk para memory_estimate (medida con tracemalloc): texto,
+# texto formateado, texto en minúsculas y metadatos en el docstore, y postings en el
+# índice BM25. Con chunks de hasta CHUNK_MAX_TOKENS (~500-900 caracteres)
+CHUNK_TEXT_BYTES = 5 * 1024
+CHUNK_SPARSE_BYTES = 512
+
+# Reglas de formato de los fragmentos mostrados, en orden de aplicación
+_FORMAT_RULES = [
+    # Artículos legales (Artículo 123.)
+    (re.compile(r'(Artículo\s+\d+[a-z]?\.)', re.IGNORECASE), r'\n\n\1'),
+    # Parágrafos (Parágrafo.)
+    (re.compile(r'(Parágrafo\s*\d*\.)', re.IGNORECASE), r'\n\n\1'),
+    # Enumeraciones con números seguidos de punto o paréntesis
+    (re.compile(r'\.\s+(\d+[.)])\s+'), r'.\n\n\1 '),
+    # Enumeraciones con letras (a), b), c))
+    (re.compile(r'\.\s+([a-z][.)])\s+'), r'.\n\n\1 '),
+    # Requisitos o items con guion o bullet
+    (re.compile(r'\.\s+([-•])\s+'), r'.\n\n\1 '),
+    # Secciones (CAPITULO, TITULO, etc)
+    (re.compile(r'(CAPITULO\s+[IVXLCDM]+)', re.IGNORECASE), r'\n\n\1'),
+    (re.compile(r'(TITULO\s+[IVXLCDM]+)', re.IGNORECASE), r'\n\n\1'),
+    # Espacios al inicio de líneas nuevas
+    (re.compile(r'\n\s+'), r'\n'),
+    # Múltiples saltos de línea (máximo 2)
+    (re.compile(r'\n{3,}'), r'\n\n'),
+]
+
+# Longitud a partir de la cual se recorta un preview
+PREVIEW_CHARS = 1500
+
+
+def format_content(text: str) -> str:
+    """Formatea el contenido de un chunk para mejor legibilidad."""
+    # Primero limpiar espacios múltiples; los saltos de línea se reconstruyen con las reglas
+    text = ' '.join(' '.join(line.split()) for line in text.split('\n'))
+    for pattern, replacement in _FORMAT_RULES:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def paragraph_offsets(formatted: str) -> List[int]:
+    """Posiciones donde empieza cada párrafo (línea) del texto formateado."""
+    offsets = [0]
+    position = formatted.find('\n')
+    while position != -1:
+        offsets.append(position + 1)
+        position = formatted.find('\n', position + 1)
+    return offsets
+
+
+def _snapshot_time(name: str) -> Optional[int]:
+    """Marca de tiempo (ns) de un directorio snapshot-<ns>, o None si el nombre no sigue ese formato."""
+    prefix, _, stamp = name.partition("-")
+    return int(stamp) if prefix == "snapshot" and stamp.isdigit() else None
 
 
 class DocumentProcessor:
     """Procesa y carga documentos PDF y DOCX."""
     
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> str:
-        """Extrae texto de un archivo PDF."""
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+    def pdf_page_count(file_path: str, cache: Optional[PageTextCache] = None,
+                       file_hash: Optional[str] = None) -> int:
+        """Número de páginas de un PDF, leído del caché de texto si ya se registró."""
+        count = cache.page_count(file_hash) if cache and file_hash else None
+        if count is None:
+            from pypdf import PdfReader
+            count = len(PdfReader(file_path).pages)
+            if cache and file_hash:
+                cache.set_page_count(file_hash, count)
+        return count
+    
+    @classmethod
+    def iter_pdf_pages(cls, file_path: str, start: int = 1, stop: Optional[int] = None,
+                       cache: Optional[PageTextCache] = None,
+                       file_hash: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """Genera (número de página, texto) de las páginas [start, stop) de un PDF, una a la vez.
+        
+        Con cache y file_hash las páginas ya extraídas se leen del disco y el PDF
+        solo se abre si falta alguna.
+        """
+        from pypdf import PdfReader
+        cached = cache is not None and file_hash is not None
+        reader = None
+        if stop is None:
+            count = cache.page_count(file_hash) if cached else None
+            if count is None:
+                reader = PdfReader(file_path)
+                count = len(reader.pages)
+                if cached:
+                    cache.set_page_count(file_hash, count)
+            stop = count + 1
+        
+        for number in range(start, stop):
+            text = cache.get(file_hash, number) if cached else None
+            if text is None:
+                if reader is None:
+                    reader = PdfReader(file_path)
+                text = reader.pages[number - 1].extract_text() + "\n"
+                if cached:
+                    cache.put(file_hash, number, text)
+            yield number, text
     
     @staticmethod
-    def extract_text_from_docx(file_path: str) -> str:
-        """Extrae texto de un archivo DOCX."""
+    def iter_docx_paragraphs(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+        """Genera los párrafos de un DOCX; el formato no tiene páginas fijas."""
+        import docx
         doc = docx.Document(file_path)
-        text = ""
         for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+            yield None, paragraph.text + "\n"
     
     @staticmethod
-    def extract_text_from_txt(file_path: str) -> str:
-        """Extrae texto de un archivo TXT."""
+    def iter_txt_lines(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+        """Genera las líneas de un archivo TXT."""
         with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            for line in f:
+                yield None, line
     
     @classmethod
-    def process_document(cls, file_path: str, filename: str) -> str:
-        """Procesa un documento y extrae su texto."""
+    def iter_document(cls, file_path: str, filename: str, cache: Optional[PageTextCache] = None,
+                      file_hash: Optional[str] = None) -> Iterator[Tuple[Optional[int], str]]:
+        """Genera el texto de un documento por partes, con su página cuando se conoce."""
         extension = Path(filename).suffix.lower()
         
         if extension == '.pdf':
-            return cls.extract_text_from_pdf(file_path)
+            return cls.iter_pdf_pages(file_path, cache=cache, file_hash=file_hash)
         elif extension == '.docx':
-            return cls.extract_text_from_docx(file_path)
+            return cls.iter_docx_paragraphs(file_path)
         elif extension == '.txt':
-            return cls.extract_text_from_txt(file_path)
+            return cls.iter_txt_lines(file_path)
         else:
             raise ValueError(f"Formato de archivo no soportado: {extension}")
+    
+    @classmethod
+    def extract_text_from_pdf(cls, file_path: str) -> str:
+        """Extrae texto de un archivo PDF."""
+        return "".join(text for _, text in cls.iter_pdf_pages(file_path))
+    
+    @classmethod
+    def extract_text_from_docx(cls, file_path: str) -> str:
+        """Extrae texto de un archivo DOCX."""
+        return "".join(text for _, text in cls.iter_docx_paragraphs(file_path))
+    
+    @staticmethod
+    def extract_text_from_txt(file_path: str) -> str:
+        """Extrae texto de un archivo TXT."""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    @classmethod
+    def process_document(cls, file_path: str, filename: str) -> str:
+        """Procesa un documento y extrae su texto completo."""
+        return "".join(text for _, text in cls.iter_document(file_path, filename))
+
+
+class LRUCache:
+    """Caché LRU acotada y segura entre hilos con contadores de aciertos y fallos."""
+    
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Devuelve el valor asociado a la clave o None si no está en caché."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: Hashable, value: Any):
+        """Guarda un valor descartando la entrada menos usada si se excede el tamaño."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Vacía la caché conservando los contadores."""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self) -> dict:
+        """Resumen de uso de la caché."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+class KeywordMatcher:
+    """
+    Busca todas las palabras clave de una consulta con una sola expresión regular.
+
+    La alternancia se compila una vez por consulta, de la más larga a la más
+    corta, y se recorre cada chunk en una pasada. Una palabra clave contenida en
+    otra que coincide en la misma posición también cuenta como presente, así el
+    resultado es el mismo que buscar cada palabra clave por separado. Se busca
+    sobre el texto en minúsculas: el guardado en los metadatos (text_lower) o,
+    en chunks de instantáneas anteriores, el que se calcula al consultar.
+    
+    Los números (de artículo, ley o decreto) solo coinciden como token completo:
+    "5" no cuenta en "245" ni en "15".
+    """
+    
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        distinct = sorted({kw.lower() for kw in keywords if kw}, key=len, reverse=True)
+        self._distinct = distinct
+        self._numbers = {kw: re.compile(rf'\b{kw}\b') for kw in distinct if kw.isdigit()}
+        # Números de la consulta, para compararlos con los artículos de cada chunk
+        self.numbers = set(self._numbers)
+        source = '|'.join(self._source(kw) for kw in distinct)
+        self._pattern = re.compile(source) if distinct else None
+        # Para ubicar palabras clave en el texto original (ver first_position)
+        self._pattern_any_case = re.compile(source, re.IGNORECASE) if distinct else None
+        self._contained = {
+            kw: {other for other in distinct if self._contains(kw, other)} for kw in distinct
+        }
+        # Una palabra clave vacía (solo puntuación) coincide en cualquier texto
+        self._has_empty = any(not kw for kw in keywords)
+    
+    def _source(self, kw: str) -> str:
+        return self._numbers[kw].pattern if kw in self._numbers else re.escape(kw)
+    
+    def _contains(self, text: str, kw: str) -> bool:
+        """La palabra clave aparece en un texto en minúsculas."""
+        number = self._numbers.get(kw)
+        return number.search(text) is not None if number else kw in text
+    
+    def found(self, text: str, text_lower: Optional[str] = None) -> set:
+        """Palabras clave (en minúsculas) presentes en el texto; text_lower es el mismo texto ya en minúsculas."""
+        found = set()
+        if self._pattern is None:
+            return found
+        if text_lower is None:
+            text_lower = text.lower()
+        match = self._pattern.search(text_lower)
+        while match:
+            found |= self._contained.get(match.group(), {match.group()})
+            # Reanudar en el siguiente carácter para no perder coincidencias solapadas
+            match = self._pattern.search(text_lower, match.start() + 1)
+        return found
+    
+    def count(self, text: str, text_lower: Optional[str] = None) -> int:
+        """Número de palabras clave de la consulta presentes en el texto."""
+        found = self.found(text, text_lower)
+        return sum(1 for kw in self.keywords if not kw or kw.lower() in found)
+    
+    def first_position(self, text: str) -> int:
+        """Posición de la primera palabra clave en el texto o -1 si no hay ninguna."""
+        if self._has_empty:
+            return 0
+        match = self._pattern_any_case.search(text) if self._pattern_any_case is not None else None
+        return match.start() if match else -1
 
 
 class RAGSystem:
     """Sistema RAG para consultas sobre documentos legales usando modelos locales."""
     
-    def __init__(self, api_key: str, model_name: str = "huggingface"):
+    # Candidatos por recuperador (vectorial y BM25) y constante de Reciprocal Rank Fusion
+    retrieval_k = 8
+    rrf_k = 60
+    # Con vectores cuantizados y rescore, candidatos por cada resultado re-puntuados con distancia exacta
+    rescore_factor = 4
+    
+    def __init__(self, api_key: str, model_name: str = "huggingface", cache_size: int = 256,
+                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_cache_dir: Optional[str] = None, index_type: str = "flat",
+                 ann_threshold: int = 50000, nlist: Optional[int] = None,
+                 search_params: Optional[dict] = None, embeddings: Optional[Embeddings] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None, vector_encoding: str = "float32",
+                 rescore: bool = True):
         self.api_key = api_key
         self.model_name = model_name
         
-        # Usar embeddings locales gratuitos
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
+        # Índice FAISS: plano (exacto) hasta ann_threshold chunks; luego se entrena el
+        # índice aproximado elegido. search_params son los valores por defecto de
+        # nprobe (IVF) y ef_search (HNSW), ajustables en cada consulta.
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Tipo de índice no soportado: {index_type}. Use {', '.join(INDEX_TYPES)}")
+        self.index_type = index_type
+        self.ann_threshold = ann_threshold
+        self.nlist = nlist
+        self.search_params = {"nprobe": 16, "ef_search": 64, **(search_params or {})}
+        
+        # Modo compacto: vectores en int8 (sq8) o product quantization (pq) una vez que hay
+        # suficientes para entrenar. Con rescore, los mejores candidatos se re-puntúan con
+        # los vectores float32 de la caché de embeddings en disco (memory-map).
+        if vector_encoding not in VECTOR_ENCODINGS:
+            raise ValueError(
+                f"Codificación de vectores no soportada: {vector_encoding}. Use {', '.join(VECTOR_ENCODINGS)}"
+            )
+        self.vector_encoding = vector_encoding
+        self.rescore = rescore
+        # Distancia del índice cuantizado menos la exacta, en promedio (ver _calculate_confidence)
+        self._distance_offset = 0.0
+        
+        # Usar embeddings locales gratuitos, salvo que se entregue un modelo ya construido.
+        # El modelo se carga en el primer uso o con warm_up.
+        self.embeddings = embeddings or LazyEmbeddings(embedding_model, model_kwargs={'device': 'cpu'})
+        
+        # Caché en disco de embeddings de chunks; sobrevive a reinicios y a reset().
+        # Varias instancias y varios procesos pueden compartir el mismo directorio.
+        self.embedding_cache = embedding_cache or (
+            EmbeddingCache(embedding_cache_dir, embedding_model) if embedding_cache_dir else None
         )
         
-        self.vector_store: Optional[FAISS] = None
+        self.vector_store: Optional["FAISS"] = None
         self.documents_loaded = []
+        
+        # Índice invertido BM25 de los mismos chunks, para la recuperación híbrida
+        self.sparse_index = BM25Index()
+        # Fila FAISS de cada chunk, construida al necesitarla y descartada con cada cambio
+        self._row_lookup: Optional[Dict[str, int]] = None
+        
+        # Registro por documento: hash del archivo, hash del texto e ids de sus chunks.
+        # Permite saltar documentos sin cambios y reemplazar los chunks de los modificados.
+        # Tras cargar un índice de disco se lee al primer uso (ver _load_registry).
+        self._document_index: Dict[str, dict] = {}
+        self._indexed_chunks = set()
+        self._registry_pending = False
+        self._registry_file: Optional[BinaryIO] = None
+        
+        # El índice cargado de disco está en memory-map de solo lectura hasta la primera escritura
+        self._index_mapped = False
+        
+        # Entrenamiento del índice aproximado en curso (fuera del lock) y eliminaciones,
+        # que renumeran filas: si hubo alguna mientras se entrenaba, se descarta
+        self._ann_training = False
+        self._deletions = 0
+        
+        # Filas eliminadas de un índice aproximado que siguen en él (ver _delete_chunks)
+        # y el selector que las excluye de las búsquedas
+        self._tombstones: Set[int] = set()
+        self._tombstone_selector: Optional[faiss.IDSelector] = None
+        
+        # Protege el índice FAISS: las búsquedas y las escrituras pueden venir de varios hilos
+        self._index_lock = threading.RLock()
+        
+        # Cachés de consultas: los embeddings no dependen del índice, las respuestas sí.
+        # index_version cambia con cada modificación del índice para invalidar respuestas.
+        self.index_version = 0
+        self._embedding_cache = LRUCache(cache_size)
+        self._result_cache = LRUCache(cache_size)
+    
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Normaliza una pregunta para usarla como clave de caché."""
+        return ' '.join(question.lower().split())
+    
+    def _bump_index_version(self):
+        """Invalida las respuestas en caché tras un cambio en el índice."""
+        self.index_version += 1
+        self._row_lookup = None
+        self._result_cache.clear()
+    
+    @property
+    def model_loaded(self) -> bool:
+        """El modelo de embeddings ya está en memoria."""
+        return getattr(self.embeddings, "loaded", True)
+    
+    def warm_up(self):
+        """Carga el modelo de embeddings y ejecuta un encode de prueba para que la primera consulta no espere."""
+        self.embeddings.embed_documents(["calentamiento del modelo de embeddings"])
+    
+    def cache_stats(self) -> dict:
+        """Contadores de las cachés de embeddings y de respuestas."""
+        return {
+            "index_version": self.index_version,
+            "embeddings": self._embedding_cache.stats(),
+            "results": self._result_cache.stats(),
+            "chunk_embeddings": self.embedding_cache.stats() if self.embedding_cache else None
+        }
+    
+    @staticmethod
+    def content_hash(data) -> str:
+        """Hash SHA-256 de un texto o de bytes."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+    
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        """Id estable de un chunk: depende del documento y de su contenido."""
+        return RAGSystem.content_hash(f"{doc.metadata.get('filename', '')}\x00{doc.metadata['chunk_hash']}")[:32]
+    
+    @property
+    def document_index(self) -> Dict[str, dict]:
+        """Registro de documentos cargados (hashes e ids de chunks)."""
+        with self._index_lock:
+            self._load_registry()
+            return self._document_index
+    
+    def _load_registry(self):
+        """Lee el registro de documentos del índice cargado de disco, si aún no se leyó."""
+        if not self._registry_pending:
+            return
+        if self._registry_file is not None:
+            self._document_index = json.load(self._registry_file)
+            self._close_registry()
+        self._indexed_chunks = set(self.vector_store.index_to_docstore_id.values())
+        # Filas eliminadas guardadas en la instantánea (id vacío)
+        self._indexed_chunks.discard("")
+        self._registry_pending = False
+    
+    def _close_registry(self):
+        if self._registry_file is not None:
+            self._registry_file.close()
+            self._registry_file = None
+    
+    def _ensure_writable_index(self):
+        """Copia a memoria el índice en memory-map antes de modificarlo."""
+        if self._index_mapped:
+            self.vector_store.index = materialize_index(self.vector_store.index)
+            self._index_mapped = False
+    
+    def find_duplicate(self, file_hash: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[str]:
+        """Devuelve el documento ya cargado con el mismo archivo o el mismo texto."""
+        with self._index_lock:
+            for filename, entry in self.document_index.items():
+                if file_hash and entry.get('file_hash') == file_hash:
+                    return filename
+                if content_hash and entry.get('content_hash') == content_hash:
+                    return filename
+        return None
     
     def _expand_query(self, question: str) -> List[str]:
         """Expande la consulta con sinónimos y términos relacionados."""
@@ -94,155 +516,729 @@ class RAGSystem:
         
         return queries[:3]  # Limitar a 3 variaciones
         
-    def add_documents(self, texts: List[str], metadatas: List[dict]):
-        """Añade documentos al sistema RAG."""
-        # Crear splitter para dividir textos largos con mejor contexto
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,  # Chunks aún más grandes para capturar artículos completos
-            chunk_overlap=400,  # Mayor overlap para no perder información entre chunks
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]  # Priorizar separadores naturales
-        )
+    @staticmethod
+    def _text_splitter() -> LegalTextSplitter:
+        """Splitter de chunks por artículo; start_index ubica cada chunk en su texto."""
+        return LegalTextSplitter(max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    
+    @staticmethod
+    def split_documents(texts: List[str], metadatas: List[dict]) -> List[Document]:
+        """Divide los textos en chunks listos para embeber."""
+        documents = []
+        for text, metadata in zip(texts, metadatas):
+            documents.extend(RAGSystem.split_stream([(None, text)], metadata))
+        return documents
+    
+    @staticmethod
+    def split_stream(segments: Iterable[Tuple[Optional[int], str]], metadata: dict,
+                     window: int = STREAM_WINDOW_CHARS) -> Iterator[Document]:
+        """
+        Divide en chunks un documento que llega por partes (páginas, párrafos o líneas).
         
-        # Crear documentos
+        Solo se mantiene en memoria una ventana de unos window caracteres: al
+        llenarse se emiten sus chunks salvo el último, que pasa a ser el inicio
+        de la siguiente ventana. Cada chunk lleva la página donde empieza, si
+        las partes la indican, y los números de artículo que contiene.
+        """
+        splitter = RAGSystem._text_splitter()
+        parts: List[str] = []
+        size = 0
+        # (posición en la ventana, página) donde empieza cada página
+        pages: List[Tuple[int, int]] = []
+        number = 0
+        
+        def page_at(position: int) -> Optional[int]:
+            i = bisect_right(pages, (position, float('inf'))) - 1
+            return pages[i][1] if i >= 0 else None
+        
+        segments = iter(segments)
+        finished = False
+        while not finished:
+            segment = next(segments, None)
+            if segment is not None:
+                page, text = segment
+                if page is not None and (not pages or pages[-1][1] != page):
+                    pages.append((size, page))
+                parts.append(text)
+                size += len(text)
+                if size < window:
+                    continue
+            else:
+                finished = True
+            
+            window_text = "".join(parts)
+            window_docs = splitter.create_documents([window_text])
+            tail = size
+            if not finished and len(window_docs) > 1 and window_docs[-1].metadata["start_index"] > 0:
+                # El último chunk puede estar incompleto: se divide con la siguiente ventana,
+                # junto con los demás trozos de su artículo para que conserven el número
+                last = window_docs.pop()
+                while len(window_docs) > 1 and "articles" in last.metadata and \
+                        window_docs[-1].metadata.get("articles") == last.metadata["articles"]:
+                    last = window_docs.pop()
+                tail = last.metadata["start_index"]
+            
+            for doc in window_docs:
+                chunk_metadata = {
+                    **metadata,
+                    "chunk": number,
+                    "chunk_hash": RAGSystem.content_hash(doc.page_content),
+                    # Para la densidad de palabras clave sin volver a tokenizar en cada consulta
+                    "token_count": len(doc.page_content.split()),
+                    # Para buscar palabras clave sin pasar el chunk a minúsculas en cada consulta
+                    "text_lower": doc.page_content.lower()
+                }
+                # El formato de los previews se calcula una vez aquí y no en cada consulta
+                formatted = format_content(doc.page_content)
+                chunk_metadata["formatted"] = formatted
+                chunk_metadata["paragraphs"] = paragraph_offsets(formatted)
+                if "articles" in doc.metadata:
+                    chunk_metadata["articles"] = doc.metadata["articles"]
+                page = page_at(max(0, doc.metadata["start_index"]))
+                if page is not None:
+                    chunk_metadata["page"] = page
+                yield Document(page_content=doc.page_content, metadata=chunk_metadata)
+                number += 1
+            
+            tail_page = page_at(tail)
+            pages = ([(0, tail_page)] if tail_page is not None else []) + \
+                [(position - tail, page) for position, page in pages if position > tail]
+            parts = [window_text[tail:]] if tail < size else []
+            size -= tail
+    
+    def add_documents(self, texts: List[str], metadatas: List[dict]) -> List[str]:
+        """Añade documentos al sistema RAG omitiendo los que ya están cargados sin cambios."""
         documents = []
+        completed = []
         for text, metadata in zip(texts, metadatas):
-            splits = text_splitter.split_text(text)
-            for i, split in enumerate(splits):
-                doc = Document(
-                    page_content=split,
-                    metadata={**metadata, "chunk": i}
-                )
-                documents.append(doc)
+            content_hash = self.content_hash(text)
+            if self.find_duplicate(metadata.get('file_hash'), content_hash):
+                continue
+            chunks = self.split_documents([text], [{"filename": metadata['filename']}])
+            documents.extend(chunks)
+            completed.append(self.document_entry(metadata['filename'], chunks, content_hash, metadata.get('file_hash')))
+        
+        self.add_chunks(documents, completed)
+        return [entry['filename'] for entry in completed]
+    
+    @classmethod
+    def document_entry(cls, filename: str, chunks: List[Document], content_hash: str,
+                       file_hash: Optional[str] = None) -> dict:
+        """Entrada del registro de documentos para un archivo ya dividido en chunks."""
+        return {
+            "filename": filename,
+            "file_hash": file_hash,
+            "content_hash": content_hash,
+            "chunk_ids": [cls._chunk_id(doc) for doc in chunks]
+        }
+    
+    def add_chunks(self, documents: List[Document], completed: Optional[List[dict]] = None):
+        """Embebe chunks ya divididos y los añade al índice.
+        
+        Los chunks ya indexados se omiten sin volver a embeberlos. completed son
+        las entradas (ver document_entry) de los documentos que quedan completos
+        con este lote; sus chunks antiguos que ya no existen se eliminan.
+        """
+        # Descartar chunks ya indexados o repetidos dentro del lote
+        new_docs = {}
+        with self._index_lock:
+            self._load_registry()
+            for doc in documents:
+                doc_id = self._chunk_id(doc)
+                if doc_id not in self._indexed_chunks and doc_id not in new_docs:
+                    new_docs[doc_id] = doc
+        
+        if new_docs:
+            # Embeber fuera del lock para no bloquear las consultas concurrentes
+            with metrics.stage("embed", pipeline="ingest"):
+                vectors = self._embed_chunks(list(new_docs.values()))
+        
+        with self._index_lock, metrics.stage("index", pipeline="ingest"):
+            # Otra carga concurrente pudo indexar los mismos chunks mientras se embebía
+            items = [
+                (doc_id, doc, vector)
+                for (doc_id, doc), vector in zip(new_docs.items(), vectors if new_docs else [])
+                if doc_id not in self._indexed_chunks
+            ]
+            if items:
+                self._add_embeddings(items)
+                metrics.inc("rag_indexed_chunks_total", len(items))
+            
+            for entry in completed or []:
+                self._replace_document_entry(entry)
+            
+            self._bump_index_version()
+        
+        if items or completed:
+            # Con chunks nuevos o eliminados puede tocar entrenar o purgar el índice
+            self._maybe_build_ann_index()
+    
+    def _embed_chunks(self, documents: List[Document]) -> List[List[float]]:
+        """Embebe chunks reutilizando los vectores de la caché en disco."""
+        if self.embedding_cache is None:
+            return self.embeddings.embed_documents([doc.page_content for doc in documents])
         
-        self.documents_loaded.extend([m['filename'] for m in metadatas])
+        hashes = [doc.metadata['chunk_hash'] for doc in documents]
+        vectors = self.embedding_cache.get_many(hashes)
+        
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_vectors = self.embeddings.embed_documents([documents[i].page_content for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+            self.embedding_cache.put_many([hashes[i] for i in missing], new_vectors)
+        
+        return vectors
+    
+    def _add_embeddings(self, items: List[tuple]):
+        """Crea el vector store o anexa los vectores al índice y docstore existentes."""
+        ids = [doc_id for doc_id, _, _ in items]
+        text_embeddings = [(doc.page_content, vector) for _, doc, vector in items]
+        metadatas = [doc.metadata for _, doc, _ in items]
         
-        # Crear o actualizar vector store
         if self.vector_store is None:
-            self.vector_store = FAISS.from_documents(documents, self.embeddings)
+            from langchain_community.vectorstores import FAISS
+            self.vector_store = FAISS.from_embeddings(
+                text_embeddings, self.embeddings, metadatas=metadatas, ids=ids
+            )
         else:
-            new_store = FAISS.from_documents(documents, self.embeddings)
-            self.vector_store.merge_from(new_store)
+            self._ensure_writable_index()
+            self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self._indexed_chunks.update(ids)
+        for doc_id, doc, _ in items:
+            self.sparse_index.add(doc_id, doc.page_content)
+    
+    def _maybe_build_ann_index(self):
+        """
+        Sustituye el índice plano por el aproximado al superar ann_threshold
+        chunks, el aproximado por uno sin las filas eliminadas cuando estas
+        superan TOMBSTONE_PURGE_FRACTION y, en modo compacto, el plano float32
+        por el cuantizado en cuanto hay vectores suficientes para entrenarlo.
+        
+        Se llama sin el lock del índice: los vectores se copian con el lock, el
+        entrenamiento (k-means) corre fuera de él sin detener las consultas y
+        el índice nuevo se instala con el lock, junto con las filas añadidas
+        mientras tanto. Si entretanto se eliminaron chunks, se descarta y se
+        vuelve a intentar con el siguiente lote.
+        """
+        with self._index_lock:
+            if self.vector_store is None or self._ann_training:
+                return
+            kind = self._pending_index_build()
+            if kind is None:
+                return
+            self._ensure_writable_index()
+            store = self.vector_store
+            index = store.index
+            n = index.ntotal
+            vectors = index.reconstruct_n(0, n)
+            tombstones = set(self._tombstones)
+            # Con el índice ya cuantizado, los vectores exactos se leen de la caché fuera del lock;
+            # al purgar, la copia da los ids de las filas que se conservan
+            exact = is_quantized(index) and self.embedding_cache is not None
+            frozen = freeze_store(store, copy_index=False) if exact or kind == "purge" else None
+            deletions = self._deletions
+            self._ann_training = True
+        
+        try:
+            rows = np.arange(n)
+            if tombstones:
+                rows = np.setdiff1d(rows, np.fromiter(tombstones, dtype=np.int64))
+                vectors = vectors[rows]
+            if exact:
+                vectors = self._exact_vectors(frozen, rows, vectors)
+            # Entrenamiento único: las filas conservan su orden, el mapeo a docstore solo pierde las eliminadas
+            if kind == "compact":
+                new_index = build_compact_index(vectors, self.vector_encoding)
+            else:
+                new_index = build_ann_index(vectors, self.index_type, nlist=self.nlist, encoding=self.vector_encoding)
+            distance_offset = calibrate_distance_offset(new_index, vectors) if is_quantized(new_index) else 0.0
+            kept_ids = [frozen.index_to_docstore_id[int(row)] for row in rows] if tombstones else None
+        finally:
+            with self._index_lock:
+                self._ann_training = False
+        
+        with self._index_lock:
+            if self.vector_store is not store or store.index is not index or self._deletions != deletions:
+                return
+            if index.ntotal > n:
+                new_index.add(index.reconstruct_n(n, index.ntotal - n))
+            if kept_ids is not None:
+                kept_ids += [store.index_to_docstore_id[row] for row in range(n, index.ntotal)]
+                store.index_to_docstore_id = dict(enumerate(kept_ids))
+                self._set_tombstones(set())
+            store.index = new_index
+            self._distance_offset = distance_offset
+            self._index_mapped = False
+            self._bump_index_version()
+    
+    def _pending_index_build(self) -> Optional[str]:
+        """Índice que corresponde entrenar con los vectores actuales: "ann", "purge", "compact" o None."""
+        index = self.vector_store.index
+        n = index.ntotal
+        if isinstance(index, (faiss.IndexIVF, faiss.IndexHNSW)):
+            if self._tombstones and len(self._tombstones) >= n * TOMBSTONE_PURGE_FRACTION:
+                return "purge"
+            return None
+        if self.index_type != "flat" and n >= max(
+            self.ann_threshold, min_training_size(self.index_type, n, self.nlist, self.vector_encoding)
+        ):
+            return "ann"
+        if (self.vector_encoding != "float32" and isinstance(index, faiss.IndexFlat)
+                and n >= min_training_size("flat", n, encoding=self.vector_encoding)):
+            return "compact"
+        return None
+    
+    def _exact_vectors(self, store: "FAISS", rows: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """
+        Reemplaza los vectores reconstruidos de las filas dadas de un índice
+        cuantizado por los vectores float32 de la caché de embeddings; los que
+        falten quedan aproximados.
+        """
+        docs = [store.docstore.search(store.index_to_docstore_id[int(row)]) for row in rows]
+        exact = self.embedding_cache.get_many([doc.metadata.get('chunk_hash') for doc in docs], record_stats=False)
+        for i, vector in enumerate(exact):
+            if vector is not None:
+                vectors[i] = vector
+        return vectors
+    
+    def _delete_chunks(self, ids: List[str]):
+        """
+        Elimina chunks del índice, del docstore y del índice BM25.
+        
+        En el plano las filas se eliminan y se renumeran. Los índices
+        aproximados no renumeran (IVF) o no eliminan (HNSW): las filas quedan
+        como eliminadas, las búsquedas las saltan y _maybe_build_ann_index
+        reconstruye el índice sin ellas, fuera del lock, cuando son muchas.
+        """
+        self._ensure_writable_index()
+        self._deletions += 1
+        for doc_id in ids:
+            self.sparse_index.remove(doc_id)
+        if isinstance(self.vector_store.index, faiss.IndexFlatCodes):
+            # Plano, float32 o cuantizado: remove_ids renumera las filas como espera langchain
+            self.vector_store.delete(ids)
+            return
+        
+        rows = self._rows()
+        self.vector_store.docstore.delete(ids)
+        self._set_tombstones(self._tombstones | {rows[doc_id] for doc_id in ids})
+    
+    def _set_tombstones(self, rows: Set[int]):
+        self._tombstones = rows
+        self._row_lookup = None
+        self._tombstone_selector = deleted_rows_selector(rows)
+    
+    def _rows(self) -> Dict[str, int]:
+        """Fila FAISS de cada chunk vigente, construida al necesitarla y descartada con cada cambio."""
+        if self._row_lookup is None:
+            tombstones = self._tombstones
+            self._row_lookup = {
+                doc_id: row for row, doc_id in self.vector_store.index_to_docstore_id.items()
+                if row not in tombstones
+            }
+        return self._row_lookup
+    
+    def index_stats(self) -> dict:
+        """Tipo y tamaño del índice FAISS actual."""
+        with self._index_lock:
+            index = self.vector_store.index if self.vector_store else None
+            return {
+                "configured_type": self.index_type,
+                "faiss_index": type(index).__name__ if index is not None else None,
+                "chunks": index.ntotal - len(self._tombstones) if index is not None else 0,
+                "deleted_rows": len(self._tombstones),
+                "sparse_chunks": len(self.sparse_index),
+                "memory_mapped": self._index_mapped,
+                "vector_encoding": self.vector_encoding,
+                "quantized": is_quantized(index) if index is not None else False,
+                "bytes_per_vector": bytes_per_vector(index) if index is not None else None,
+                "rescore": self._rescoring(index) if index is not None else False
+            }
+    
+    def memory_estimate(self) -> int:
+        """
+        Bytes aproximados que ocupa el índice en memoria: vectores, chunks del
+        docstore e índice BM25. Lo abierto con memory-map desde una instantánea
+        no cuenta: el sistema operativo libera esas páginas cuando las necesita.
+        """
+        with self._index_lock:
+            if self.vector_store is None:
+                return 0
+            index = self.vector_store.index
+            docstore = self.vector_store.docstore
+            total = len(self.sparse_index) * CHUNK_SPARSE_BYTES
+            if not self._index_mapped:
+                total += index.ntotal * bytes_per_vector(index)
+            in_memory_chunks = docstore.added_count if isinstance(docstore, MmapDocstore) else index.ntotal
+            return total + in_memory_chunks * CHUNK_TEXT_BYTES
+    
+    def _replace_document_entry(self, entry: dict):
+        """Registra un documento y elimina los chunks de su versión anterior."""
+        filename = entry['filename']
+        previous = self.document_index.get(filename)
+        if previous:
+            stale_ids = list(set(previous['chunk_ids']) - set(entry['chunk_ids']))
+            stale_ids = [doc_id for doc_id in stale_ids if doc_id in self._indexed_chunks]
+            if stale_ids:
+                self._delete_chunks(stale_ids)
+                self._indexed_chunks.difference_update(stale_ids)
+        
+        self._document_index[filename] = entry
+        if filename not in self.documents_loaded:
+            self.documents_loaded.append(filename)
+    
+    def query(self, question: str, search_params: Optional[dict] = None) -> dict:
+        """Realiza una consulta al sistema RAG con búsqueda híbrida y re-ranking.
+        
+        search_params permite ajustar nprobe/ef_search del índice aproximado en esta consulta.
+        """
+        return self._result_from_events(self.query_stream(question, search_params))
+    
+    def query_batch(self, questions: List[str], search_params: Optional[dict] = None,
+                    batch_size: int = 256) -> List[dict]:
+        """
+        Responde muchas preguntas con el mismo resultado que query, en lotes.
+        
+        Por cada lote de batch_size preguntas sin respuesta en caché se hace una
+        sola pasada del modelo de embeddings y una sola búsqueda FAISS matricial.
+        Las preguntas repetidas se resuelven una vez.
+        """
+        if self.vector_store is None:
+            raise ValueError("No hay documentos cargados en el sistema.")
+        
+        metrics.inc("rag_queries_total", len(questions))
+        search_params = self._effective_search_params(search_params)
+        results: List[Optional[dict]] = [None] * len(questions)
+        
+        # Clave de caché -> posiciones de las preguntas que la comparten
+        pending: Dict[tuple, List[int]] = {}
+        for i, question in enumerate(questions):
+            cache_key = self._query_cache_key(question, search_params)
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                results[i] = self._result_from_events(copy.deepcopy(cached))
+            else:
+                pending.setdefault(cache_key, []).append(i)
+        
+        pending_items = list(pending.items())
+        for start in range(0, len(pending_items), batch_size):
+            batch = pending_items[start:start + batch_size]
+            batch_questions = [questions[positions[0]] for _, positions in batch]
+            retrieved = self._hybrid_search_batch(batch_questions, search_params)
+            
+            for (cache_key, positions), question, docs_with_scores in zip(batch, batch_questions, retrieved):
+                events = list(self._answer_events(question, docs_with_scores))
+                self._result_cache.put(cache_key, events)
+                for i in positions:
+                    results[i] = self._result_from_events(copy.deepcopy(events))
+        
+        return results
+    
+    @staticmethod
+    def _result_from_events(events: Iterable[dict]) -> dict:
+        """Arma la respuesta completa a partir de los eventos de query_stream."""
+        result = {"answer": "", "sources": [], "confidence": "Baja"}
+        answer_parts = []
+        for event in events:
+            if event["event"] == "sources":
+                result["sources"] = event["sources"]
+                result["confidence"] = event["confidence"]
+            else:
+                answer_parts.append(event["text"])
+        result["answer"] = "".join(answer_parts)
+        return result
+    
+    def _effective_search_params(self, search_params: Optional[dict]) -> dict:
+        """Parámetros de búsqueda por defecto con los de la consulta que tengan valor."""
+        return {**self.search_params, **{k: v for k, v in (search_params or {}).items() if v}}
+    
+    def _query_cache_key(self, question: str, search_params: dict) -> tuple:
+        """Las respuestas en caché solo son válidas para la versión actual del índice."""
+        return (self._normalize_question(question), self.index_version, tuple(sorted(search_params.items())))
+    
+    def query_stream(self, question: str, search_params: Optional[dict] = None) -> Iterator[dict]:
+        """
+        Genera la respuesta de una consulta por partes.
         
-    def query(self, question: str) -> dict:
-        """Realiza una consulta al sistema RAG con búsqueda expandida y re-ranking."""
+        Primero {"event": "sources"} con las fuentes y la confianza en cuanto
+        termina la recuperación; luego un {"event": "fragment"} por cada parte
+        de la respuesta a medida que se formatea.
+        """
         if self.vector_store is None:
             raise ValueError("No hay documentos cargados en el sistema.")
         
-        # Expandir la consulta con variaciones
-        expanded_queries = self._expand_query(question)
-        
-        # Buscar con todas las variaciones y combinar resultados
-        all_docs = {}
-        for query in expanded_queries:
-            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=10)
-            for doc, score in docs_with_scores:
-                doc_key = doc.page_content[:100]  # Usar inicio como clave única
-                if doc_key not in all_docs or all_docs[doc_key]['score'] > score:
-                    all_docs[doc_key] = {
-                        'doc': doc,
-                        'score': score
-                    }
-        
-        # Convertir a lista y ordenar por score
-        docs_with_scores = [(item['doc'], item['score']) for item in all_docs.values()]
-        docs_with_scores.sort(key=lambda x: x[1])  # Menor score = más similar
+        metrics.inc("rag_queries_total")
+        search_params = self._effective_search_params(search_params)
+        cache_key = self._query_cache_key(question, search_params)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            yield from copy.deepcopy(cached)
+            return
         
+        # Recuperación híbrida: una búsqueda vectorial y una BM25 fusionadas por rango
+        docs_with_scores = self._hybrid_search_batch([question], search_params)[0]
+        
+        events = []
+        for event in self._answer_events(question, docs_with_scores):
+            events.append(event)
+            yield copy.deepcopy(event)
+        
+        # Solo se guarda la respuesta completa (el consumidor pudo cortar antes)
+        self._result_cache.put(cache_key, events)
+    
+    def _answer_events(self, question: str, docs_with_scores: List[tuple]) -> Iterator[dict]:
+        """Re-rankea los candidatos y genera los eventos de fuentes y fragmentos."""
         # Re-ranking: priorizar chunks que contienen palabras clave de la pregunta
-        keywords = self._extract_keywords(question)
-        reranked_docs = self._rerank_by_keywords(docs_with_scores[:15], keywords)
+        with metrics.stage("rerank"):
+            matcher = KeywordMatcher(self._extract_keywords(question))
+            reranked_docs = self._rerank_by_keywords(docs_with_scores[:15], matcher)
         
         # Procesar fuentes con mejor re-ranking
         sources = []
+        docs = []
         for doc, score, keyword_score in reranked_docs:
+            docs.append(doc)
             sources.append({
                 "content": doc.page_content,
                 "filename": doc.metadata.get("filename", "Desconocido"),
                 "chunk": doc.metadata.get("chunk", 0),
+                "articles": doc.metadata.get("articles", []),
                 "score": float(score),
                 "keyword_score": keyword_score
             })
         
         # Filtrar resultados realmente relevantes
-        relevant_sources = [s for s in sources if s['keyword_score'] >= 2]  # Al menos 2 keywords
+        relevant = [i for i, s in enumerate(sources) if s['keyword_score'] >= 2]  # Al menos 2 keywords
         
-        if not relevant_sources and sources:
+        if not relevant and sources:
             # Si el filtro es muy estricto, usar los mejores por score
-            relevant_sources = sources[:3]
+            relevant = list(range(min(3, len(sources))))
+        relevant_sources = [sources[i] for i in relevant]
+        # Metadatos de cada fuente relevante, con el texto ya formateado para los previews
+        relevant_metadata = [docs[i].metadata for i in relevant]
+        
+        yield {
+            "event": "sources",
+            "sources": relevant_sources if relevant_sources else sources[:3],
+            "confidence": self._calculate_confidence(relevant_sources if relevant_sources else sources)
+        }
         
+        for text in self._answer_parts(question, relevant_sources, relevant_metadata, matcher):
+            yield {"event": "fragment", "text": text}
+    
+    def _answer_parts(self, question: str, relevant_sources: List[dict], relevant_metadata: List[dict],
+                      matcher: KeywordMatcher) -> Iterator[str]:
+        """Genera la respuesta formateada parte por parte según el tipo de pregunta."""
         # Crear una respuesta más estructurada y precisa
-        if relevant_sources:
-            # Analizar el tipo de pregunta para dar formato adecuado
-            question_lower = question.lower()
-            
-            # Determinar el contexto de la pregunta
-            is_definition = any(word in question_lower for word in ["qué es", "define", "significado", "concepto"])
-            is_requirements = any(word in question_lower for word in ["requisitos", "condiciones", "debe cumplir", "exigencias"])
-            is_list = any(word in question_lower for word in ["cuáles", "cuántos", "lista", "enumera"])
-            is_how = any(word in question_lower for word in ["cómo", "de qué manera", "procedimiento", "proceso"])
-            is_when = any(word in question_lower for word in ["cuándo", "plazo", "fecha", "tiempo"])
-            is_amount = any(word in question_lower for word in ["cuánto", "valor", "precio", "monto", "costo"])
-            
-            # Construir respuesta según el tipo de pregunta
-            answer_parts = []
+        if not relevant_sources:
+            yield (
+                "❌ **No se encontró información específica** para responder tu pregunta.\n\n"
+                "**Sugerencias:**\n"
+                "- Verifica que el documento contenga información sobre este tema\n"
+                "- Intenta usar términos diferentes (ej: 'requisitos' en vez de 'condiciones')\n"
+                "- Asegúrate de que el documento esté correctamente cargado\n"
+            )
+            return
+        
+        # Analizar el tipo de pregunta para dar formato adecuado
+        question_lower = question.lower()
+        
+        # Determinar el contexto de la pregunta
+        is_definition = any(word in question_lower for word in ["qué es", "define", "significado", "concepto"])
+        is_requirements = any(word in question_lower for word in ["requisitos", "condiciones", "debe cumplir", "exigencias"])
+        is_list = any(word in question_lower for word in ["cuáles", "cuántos", "lista", "enumera"])
+        is_how = any(word in question_lower for word in ["cómo", "de qué manera", "procedimiento", "proceso"])
+        is_when = any(word in question_lower for word in ["cuándo", "plazo", "fecha", "tiempo"])
+        is_amount = any(word in question_lower for word in ["cuánto", "valor", "precio", "monto", "costo"])
+        
+        # Construir respuesta según el tipo de pregunta
+        if is_definition:
+            yield "📖 **Definición Legal:**\n\n"
+        elif is_requirements:
+            yield "📋 **Requisitos según la Ley:**\n\n"
+        elif is_list:
+            yield "📋 **Información encontrada:**\n\n"
+        elif is_how:
+            yield "⚙️ **Procedimiento Legal:**\n\n"
+        elif is_when:
+            yield "📅 **Información sobre Plazos:**\n\n"
+        elif is_amount:
+            yield "💰 **Valores/Montos:**\n\n"
+        else:
+            yield "📄 **Según el documento legal:**\n\n"
+        
+        # Agrupar y mostrar los fragmentos más relevantes
+        if is_requirements or is_list:
+            # Para requisitos/listas, mostrar SOLO el fragmento más relevante
+            best_source = relevant_sources[0]  # El primero es el más relevante (ya está ordenado)
+            content = best_source['content'].strip()
+            with metrics.stage("preview"):
+                content_preview = self._create_smart_preview(content, matcher, relevant_metadata[0])
             
-            if is_definition:
-                answer_parts.append("📖 **Definición Legal:**\n\n")
-            elif is_requirements:
-                answer_parts.append("📋 **Requisitos según la Ley:**\n\n")
-            elif is_list:
-                answer_parts.append("📋 **Información encontrada:**\n\n")
-            elif is_how:
-                answer_parts.append("⚙️ **Procedimiento Legal:**\n\n")
-            elif is_when:
-                answer_parts.append("📅 **Información sobre Plazos:**\n\n")
-            elif is_amount:
-                answer_parts.append("💰 **Valores/Montos:**\n\n")
-            else:
-                answer_parts.append("📄 **Según el documento legal:**\n\n")
+            # Mostrar directamente el contenido sin etiqueta de relevancia
+            yield f"{content_preview}\n\n"
             
-            # Agrupar y mostrar los fragmentos más relevantes
-            if is_requirements or is_list:
-                # Para requisitos/listas, mostrar SOLO el fragmento más relevante
-                best_source = relevant_sources[0]  # El primero es el más relevante (ya está ordenado)
-                content = best_source['content'].strip()
-                content_preview = self._create_smart_preview(content, keywords)
-                
-                # Mostrar directamente el contenido sin etiqueta de relevancia
-                answer_parts.append(f"{content_preview}\n\n")
+            # Mencionar si hay más información disponible
+            if len(relevant_sources) > 1:
+                yield f"_💡 Nota: Se encontraron {len(relevant_sources)} fragmentos relacionados. Mostrando el más relevante._\n"
+        else:
+            # Para otras preguntas, mostrar fragmentos individuales
+            for i, source in enumerate(relevant_sources[:3], 1):
+                content = source['content'].strip()
+                with metrics.stage("preview"):
+                    content_preview = self._create_smart_preview(content, matcher, relevant_metadata[i - 1])
                 
-                # Mencionar si hay más información disponible
-                if len(relevant_sources) > 1:
-                    answer_parts.append(f"_💡 Nota: Se encontraron {len(relevant_sources)} fragmentos relacionados. Mostrando el más relevante._\n")
+                relevance_text = f"{int(source['keyword_score'])} palabras clave"
+                yield f"**Fragmento {i}** ({relevance_text}):\n\n{content_preview}\n\n---\n\n"
+        
+        # Agregar contexto adicional solo para preguntas que no sean requisitos/listas
+        if not (is_requirements or is_list):
+            if len(relevant_sources) > 5:
+                yield f"\n_💡 Se encontraron {len(relevant_sources)} fragmentos relevantes en total._\n"
+            elif len(relevant_sources) > 3:
+                yield f"\n_Se encontraron {len(relevant_sources)} fragmentos relacionados._\n"
+    
+    def _hybrid_search_batch(self, questions: List[str], search_params: Optional[dict] = None) -> List[List[tuple]]:
+        """
+        Combina los candidatos vectoriales y BM25 de cada pregunta con Reciprocal Rank Fusion.
+        
+        Todas las preguntas se embeben en una pasada y se buscan con una sola
+        llamada a FAISS. Las variaciones de _expand_query solo amplían la consulta
+        BM25, sin búsquedas vectoriales adicionales. Devuelve por pregunta
+        (doc, distancia L2) en orden de fusión; los chunks encontrados solo por
+        BM25 reciben su distancia real al vector de la consulta.
+        """
+        with metrics.stage("embed"):
+            query_vectors = self._embed_queries(questions)
+        with metrics.stage("expand"):
+            sparse_queries = [" ".join(self._expand_query(question)) for question in questions]
+        
+        results = []
+        with self._index_lock:
+            with metrics.stage("vector_search"):
+                dense_results = self._search_by_vectors(query_vectors, k=self.retrieval_k, search_params=search_params)
+            for query_vector, dense, sparse_query in zip(query_vectors, dense_results, sparse_queries):
+                with metrics.stage("bm25_search"):
+                    sparse = self.sparse_index.search(sparse_query, self.retrieval_k)
+                with metrics.stage("fuse"):
+                    results.append(self._fuse(query_vector, dense, sparse))
+        return results
+    
+    def _fuse(self, query_vector: List[float], dense: List[tuple], sparse: List[tuple]) -> List[tuple]:
+        """Reciprocal Rank Fusion de los resultados vectoriales y BM25 de una pregunta."""
+        fused = {}
+        for rank, (doc, distance) in enumerate(dense):
+            doc_id = self._chunk_id(doc)
+            fused[doc_id] = {"doc": doc, "distance": distance, "rrf": 1 / (self.rrf_k + rank + 1)}
+        for rank, (doc_id, _) in enumerate(sparse):
+            if doc_id not in fused:
+                fused[doc_id] = {"doc": self.vector_store.docstore.search(doc_id), "distance": None, "rrf": 0.0}
+            fused[doc_id]["rrf"] += 1 / (self.rrf_k + rank + 1)
+        
+        sparse_only = [doc_id for doc_id, item in fused.items() if item["distance"] is None]
+        if sparse_only:
+            fallback = dense[-1][1] if dense else None
+            for doc_id, distance in zip(sparse_only, self._distances_to(query_vector, sparse_only, fallback)):
+                fused[doc_id]["distance"] = distance
+        
+        ranked = sorted(fused.values(), key=lambda item: -item["rrf"])
+        
+        # El mismo texto puede estar en varios documentos: conservar el mejor
+        results, seen = [], set()
+        for item in ranked:
+            doc_key = item["doc"].page_content[:100]
+            if doc_key not in seen:
+                seen.add(doc_key)
+                results.append((item["doc"], item["distance"]))
+        return results
+    
+    def _distances_to(self, vector: List[float], doc_ids: List[str], fallback: Optional[float]) -> List[float]:
+        """Distancia L2 al cuadrado (como FAISS) entre la consulta y chunks indexados."""
+        rows = self._rows()
+        query = np.asarray(vector, dtype=np.float32)
+        index = self.vector_store.index
+        exact = [None] * len(doc_ids)
+        if self._rescoring(index):
+            docs = [self.vector_store.docstore.search(doc_id) for doc_id in doc_ids]
+            exact = self.embedding_cache.get_many([doc.metadata.get('chunk_hash') for doc in docs], record_stats=False)
+        distances = []
+        for doc_id, stored in zip(doc_ids, exact):
+            try:
+                if stored is None:
+                    stored = index.reconstruct(rows[doc_id])
+                distances.append(float(np.sum((stored - query) ** 2)))
+            except (KeyError, RuntimeError):
+                # Índice sin reconstrucción: como no entró en el top-k vectorial,
+                # está al menos tan lejos como el último candidato
+                distances.append(fallback if fallback is not None else 100.0)
+        return distances
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embebe consultas reutilizando la caché; las faltantes van en un solo lote."""
+        keys = [self._normalize_question(q) for q in queries]
+        vectors = [self._embedding_cache.get(key) for key in keys]
+        
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_vectors = self.embeddings.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+                self._embedding_cache.put(keys[i], vector)
+        
+        return vectors
+    
+    def _search_by_vectors(self, vectors: List[List[float]], k: int,
+                           search_params: Optional[dict] = None) -> List[List[tuple]]:
+        """Busca varios vectores de consulta en una sola llamada a FAISS."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        
+        results = []
+        with self._index_lock:
+            if self.vector_store is None:
+                # El sistema pudo reiniciarse mientras se embebía la consulta
+                raise ValueError("No hay documentos cargados en el sistema.")
+            index = self.vector_store.index
+            rescore = self._rescoring(index)
+            fetch_k = k * self.rescore_factor if rescore else k
+            params = search_parameters(index, **(search_params or self.search_params),
+                                       exclude=self._tombstone_selector)
+            if params is None:
+                scores, indices = index.search(matrix, fetch_k)
             else:
-                # Para otras preguntas, mostrar fragmentos individuales
-                for i, source in enumerate(relevant_sources[:3], 1):
-                    content = source['content'].strip()
-                    content_preview = self._create_smart_preview(content, keywords)
-                    
-                    relevance_text = f"{int(source['keyword_score'])} palabras clave"
-                    answer_parts.append(f"**Fragmento {i}** ({relevance_text}):\n\n{content_preview}\n\n---\n\n")
-            
-            # Agregar contexto adicional solo para preguntas que no sean requisitos/listas
-            if not (is_requirements or is_list):
-                if len(relevant_sources) > 5:
-                    answer_parts.append(f"\n_💡 Se encontraron {len(relevant_sources)} fragmentos relevantes en total._\n")
-                elif len(relevant_sources) > 3:
-                    answer_parts.append(f"\n_Se encontraron {len(relevant_sources)} fragmentos relacionados._\n")
-            
-            answer = "".join(answer_parts)
-        else:
-            answer = "❌ **No se encontró información específica** para responder tu pregunta.\n\n"
-            answer += "**Sugerencias:**\n"
-            answer += "- Verifica que el documento contenga información sobre este tema\n"
-            answer += "- Intenta usar términos diferentes (ej: 'requisitos' en vez de 'condiciones')\n"
-            answer += "- Asegúrate de que el documento esté correctamente cargado\n"
+                scores, indices = index.search(matrix, fetch_k, params=params)
+            for query, row_scores, row_indices in zip(matrix, scores, indices):
+                docs_with_scores = []
+                for score, idx in zip(row_scores, row_indices):
+                    if idx == -1:
+                        # FAISS devuelve -1 cuando hay menos de k vectores
+                        continue
+                    doc_id = self.vector_store.index_to_docstore_id[idx]
+                    docs_with_scores.append((self.vector_store.docstore.search(doc_id), float(score)))
+                if rescore:
+                    docs_with_scores = self._rescore(query, docs_with_scores)[:k]
+                results.append(docs_with_scores)
         
-        return {
-            "answer": answer,
-            "sources": relevant_sources if relevant_sources else sources[:3],
-            "confidence": self._calculate_confidence(relevant_sources if relevant_sources else sources)
-        }
+        return results
+    
+    def _rescoring(self, index: faiss.Index) -> bool:
+        """Las distancias se recalculan con los vectores exactos de la caché de embeddings."""
+        return self.rescore and self.embedding_cache is not None and is_quantized(index)
+    
+    def _rescore(self, query: np.ndarray, docs_with_scores: List[tuple]) -> List[tuple]:
+        """
+        Reordena candidatos por su distancia L2 exacta a la consulta. Los que no
+        están en la caché conservan la distancia del índice, corregida por el
+        desfase medio de la cuantización.
+        """
+        hashes = [doc.metadata.get('chunk_hash') for doc, _ in docs_with_scores]
+        exact = self.embedding_cache.get_many(hashes, record_stats=False)
+        rescored = []
+        for (doc, score), vector in zip(docs_with_scores, exact):
+            distance = float(np.sum((vector - query) ** 2)) if vector is not None else score - self._distance_offset
+            rescored.append((doc, distance))
+        rescored.sort(key=lambda item: item[1])
+        return rescored
     
     def _extract_keywords(self, question: str) -> List[str]:
         """Extrae palabras clave importantes de la pregunta."""
@@ -253,6 +1249,8 @@ class RAGSystem:
         
         words = question.lower().split()
         keywords = [w.strip('¿?.,;:()') for w in words if w.lower() not in stopwords and len(w) > 3]
+        # Números de artículo, ley o decreto: referencias exactas aunque sean cortas
+        keywords += [w.strip('¿?.,;:()') for w in words if len(w) <= 3 and w.strip('¿?.,;:()').isdigit()]
         
         # Agregar bigramas importantes
         bigrams = []
@@ -263,119 +1261,86 @@ class RAGSystem:
         
         return keywords + bigrams
     
-    def _rerank_by_keywords(self, docs_with_scores: List[tuple], keywords: List[str]) -> List[tuple]:
-        """Re-rankea documentos basándose en la presencia de palabras clave."""
+    def _rerank_by_keywords(self, docs_with_scores: List[tuple], matcher: KeywordMatcher) -> List[tuple]:
+        """
+        Re-rankea documentos basándose en la presencia de palabras clave.
+        
+        Los chunks de un artículo citado en la pregunta ("Artículo 5") van
+        primero, según los números de artículo guardados en sus metadatos.
+        """
         scored_docs = []
         
         for doc, score in docs_with_scores:
-            content_lower = doc.page_content.lower()
-            
             # Contar keywords presentes
-            keyword_score = sum(1 for kw in keywords if kw.lower() in content_lower)
+            keyword_score = matcher.count(doc.page_content, doc.metadata.get("text_lower"))
             
             # Bonus por densidad de keywords
             if keyword_score > 0:
-                keyword_density = keyword_score / len(content_lower.split()) * 1000
+                token_count = doc.metadata.get("token_count") or len(doc.page_content.split())
+                keyword_density = keyword_score / token_count * 1000
                 keyword_score += keyword_density
             
             scored_docs.append((doc, score, keyword_score))
         
-        # Ordenar por keyword_score (descendente) y luego por similarity score (ascendente)
-        scored_docs.sort(key=lambda x: (-x[2], x[1]))
+        # Primero los artículos citados, luego por keyword_score (descendente); a igualdad
+        # se conserva el orden de la fusión
+        scored_docs.sort(key=lambda x: (matcher.numbers.isdisjoint(x[0].metadata.get("articles", ())), -x[2]))
         
         return scored_docs
     
-    def _create_smart_preview(self, content: str, keywords: List[str]) -> str:
-        """Crea un preview inteligente mostrando el contexto completo y relevante."""
-        content_lower = content.lower()
-        
-        # Buscar todas las posiciones de keywords
-        keyword_positions = []
-        for kw in keywords:
-            pos = 0
-            while True:
-                pos = content_lower.find(kw.lower(), pos)
-                if pos == -1:
-                    break
-                keyword_positions.append(pos)
-                pos += 1
-        
-        if not keyword_positions:
-            # Si no hay keywords, mostrar inicio completo sin truncar tanto
-            return self._format_content(content[:1500])
+    def _create_smart_preview(self, content: str, matcher: KeywordMatcher,
+                              metadata: Optional[dict] = None) -> str:
+        """
+        Crea un preview inteligente mostrando el contexto completo y relevante.
         
-        # Encontrar la posición más temprana de keywords
-        best_position = min(keyword_positions)
+        Usa el texto formateado y los inicios de párrafo guardados en los
+        metadatos del chunk; los chunks indexados antes de guardarlos se
+        formatean aquí.
+        """
+        if metadata and "formatted" in metadata:
+            formatted, paragraphs = metadata["formatted"], metadata["paragraphs"]
+        else:
+            formatted = format_content(content)
+            paragraphs = paragraph_offsets(formatted)
         
-        # Buscar el inicio del párrafo o sección más cercano
-        start = content.rfind('\n\n', 0, best_position)
-        if start == -1:
-            # Si no hay doble salto, buscar salto simple
-            start = content.rfind('\n', 0, best_position)
-            if start == -1:
-                start = max(0, best_position - 150)
+        # Posición más temprana de cualquier keyword
+        best_position = matcher.first_position(formatted)
+        
+        if best_position == -1:
+            # Si no hay keywords, mostrar inicio completo sin truncar tanto
+            return formatted[:PREVIEW_CHARS].strip()
+        
+        # Inicio del párrafo o sección que contiene la keyword
+        start = paragraphs[bisect_right(paragraphs, best_position) - 1]
+        if best_position - start > PREVIEW_CHARS:
+            # Párrafo muy largo: empezar en la frase de la keyword para no recortarla
+            sentence = formatted.rfind('. ', start, best_position)
+            start = sentence + 2 if sentence != -1 else max(start, best_position - 150)
         
         # Mostrar desde el inicio encontrado hasta el final del chunk
-        preview = content[start:].strip()
+        preview = formatted[start:].strip()
         
         # Solo truncar si es realmente muy largo (más de 1800 chars)
         if len(preview) > 1800:
             # Buscar un punto de corte natural (punto final) después de 1500 chars
-            cut_point = preview.find('. ', 1500)
+            cut_point = preview.find('. ', PREVIEW_CHARS)
             if cut_point != -1 and cut_point < 2000:
                 preview = preview[:cut_point + 1]
             else:
                 # Si no encuentra punto, buscar salto de línea
-                cut_point = preview.find('\n', 1500)
+                cut_point = preview.find('\n', PREVIEW_CHARS)
                 if cut_point != -1 and cut_point < 2000:
                     preview = preview[:cut_point]
                 else:
                     preview = preview[:1800] + "..."
         
-        return self._format_content(preview)
-    
-    def _format_content(self, text: str) -> str:
-        """Formatea el contenido para mejor legibilidad."""
-        import re
-        
-        # Primero limpiar espacios múltiples pero preservar saltos de línea importantes
-        lines = text.split('\n')
-        cleaned_lines = [' '.join(line.split()) for line in lines]
-        text = ' '.join(cleaned_lines)
-        
-        # Agregar saltos de línea después de patrones específicos
-        
-        # Para artículos legales (Artículo 123.)
-        text = re.sub(r'(Artículo\s+\d+[a-z]?\.)', r'\n\n\1', text, flags=re.IGNORECASE)
-        
-        # Para parágrafo (Parágrafo.)
-        text = re.sub(r'(Parágrafo\s*\d*\.)', r'\n\n\1', text, flags=re.IGNORECASE)
-        
-        # Para enumeraciones con números seguidos de punto o paréntesis
-        text = re.sub(r'\.\s+(\d+[.)])\s+', r'.\n\n\1 ', text)
-        
-        # Para enumeraciones con letras (a), b), c))
-        text = re.sub(r'\.\s+([a-z][.)])\s+', r'.\n\n\1 ', text)
-        
-        # Para requisitos o items con guion o bullet
-        text = re.sub(r'\.\s+([-•])\s+', r'.\n\n\1 ', text)
-        
-        # Para secciones (CAPITULO, TITULO, etc)
-        text = re.sub(r'(CAPITULO\s+[IVXLCDM]+)', r'\n\n\1', text, flags=re.IGNORECASE)
-        text = re.sub(r'(TITULO\s+[IVXLCDM]+)', r'\n\n\1', text, flags=re.IGNORECASE)
-        
-        # Limpiar espacios al inicio de líneas nuevas
-        text = re.sub(r'\n\s+', r'\n', text)
-        
-        # Limpiar múltiples saltos de línea (máximo 2)
-        text = re.sub(r'\n{3,}', r'\n\n', text)
-        
-        return text.strip()
+        return preview
     
     def _combine_related_fragments(self, sources: List[dict], keywords: List[str]) -> str:
         """Combina múltiples fragmentos relacionados en una respuesta cohesiva."""
         combined_parts = []
         seen_content = set()
+        matcher = KeywordMatcher(keywords)
         
         for i, source in enumerate(sources, 1):
             content = source['content'].strip()
@@ -387,7 +1352,7 @@ class RAGSystem:
             seen_content.add(content_signature)
             
             # Crear preview inteligente
-            preview = self._create_smart_preview(content, keywords)
+            preview = self._create_smart_preview(content, matcher)
             
             # Detectar si contiene lista/enumeración
             has_enumeration = any(pattern in preview for pattern in ['1.', '2.', 'a)', 'b)', '•', '-'])
@@ -415,27 +1380,165 @@ class RAGSystem:
         # < 0.5 = Muy similar (Alta confianza)
         # 0.5-0.8 = Similar (Media confianza)
         # > 0.8 = Poco similar (Baja confianza)
-        if avg_score < 0.5 and len(sources) >= 3:
+        # Con vectores cuantizados sin rescore, los umbrales se desplazan a la escala del índice
+        offset = 0.0
+        if self.vector_store is not None and not self._rescoring(self.vector_store.index):
+            offset = self._distance_offset
+        if avg_score < 0.5 + offset and len(sources) >= 3:
             return "Alta"
-        elif avg_score < 0.8 and len(sources) >= 2:
+        elif avg_score < 0.8 + offset and len(sources) >= 2:
             return "Media"
         else:
             return "Baja"
     
     def save_vector_store(self, path: str):
-        """Guarda el vector store en disco."""
-        if self.vector_store:
-            self.vector_store.save_local(path)
+        """Guarda el vector store en disco en formato apto para memory-map."""
+        state = self._capture_state()
+        if state is not None:
+            self._write_state(Path(path), state)
+    
+    def _capture_state(self) -> Optional[dict]:
+        """
+        Copia del índice para guardarla sin retener el lock: el índice FAISS se
+        clona (el de memory-map se comparte, nunca se modifica en el lugar) y
+        el resto se copia superficialmente. None si no hay documentos.
+        """
+        with self._index_lock:
+            if self.vector_store is None:
+                return None
+            return {
+                "vector_store": freeze_store(self.vector_store, copy_index=not self._index_mapped),
+                "deleted_rows": set(self._tombstones),
+                "documents_loaded": list(self.documents_loaded),
+                "registry": dict(self.document_index),
+                "sparse_index": self.sparse_index.snapshot(),
+                "distance_offset": self._distance_offset
+            }
+    
+    @staticmethod
+    def _write_state(path: Path, state: dict):
+        """Escribe en path una copia tomada con _capture_state."""
+        write_store(path, state["vector_store"], state["deleted_rows"])
+        # Hashes de documentos y chunks junto al índice para deduplicar tras recargar
+        with open(path / "documents.json", "w", encoding="utf-8") as f:
+            json.dump({"documents_loaded": state["documents_loaded"]}, f, ensure_ascii=False)
+        with open(path / "registry.json", "w", encoding="utf-8") as f:
+            json.dump(state["registry"], f, ensure_ascii=False)
+        state["sparse_index"].save(path / SPARSE_INDEX_DIR)
+        with open(path / QUANTIZATION_FILE, "w", encoding="utf-8") as f:
+            json.dump({"distance_offset": state["distance_offset"]}, f)
     
     def load_vector_store(self, path: str):
-        """Carga el vector store desde disco."""
-        self.vector_store = FAISS.load_local(
-            path,
-            self.embeddings,
-            allow_dangerous_deserialization=True
-        )
+        """
+        Carga el vector store desde disco sin copiarlo a memoria.
+        
+        Los vectores y los textos quedan en memory-map de solo lectura, así los
+        workers del mismo nodo comparten páginas y el tiempo de carga no depende
+        del tamaño del corpus.
+        """
+        vector_store = read_store(path, self.embeddings)
+        documents_path = Path(path) / "documents.json"
+        documents_loaded = []
+        if documents_path.exists():
+            with open(documents_path, encoding="utf-8") as f:
+                documents_loaded = json.load(f)["documents_loaded"]
+        
+        sparse_path = Path(path) / SPARSE_INDEX_DIR
+        if sparse_path.exists():
+            sparse_index = BM25Index.load(sparse_path)
+        else:
+            # Instantáneas sin índice BM25 o con el formato JSON anterior: reconstruirlo desde el docstore
+            sparse_index = BM25Index.from_documents(
+                (doc_id, vector_store.docstore.search(doc_id).page_content)
+                for doc_id in vector_store.index_to_docstore_id.values() if doc_id
+            )
+        
+        distance_offset = 0.0
+        quantization_path = Path(path) / QUANTIZATION_FILE
+        if quantization_path.exists():
+            with open(quantization_path, encoding="utf-8") as f:
+                distance_offset = json.load(f)["distance_offset"]
+        
+        # El registro se lee al primer uso; el archivo queda abierto por si otro
+        # proceso elimina la instantánea antes
+        registry_path = Path(path) / "registry.json"
+        registry_file = open(registry_path, "rb") if registry_path.exists() else None
+        # Filas eliminadas de un índice aproximado: se guardan con id vacío
+        tombstones = set(np.flatnonzero(vector_store.docstore.ids == b"").tolist())
+        
+        with self._index_lock:
+            self.vector_store = vector_store
+            self.sparse_index = sparse_index
+            self._distance_offset = distance_offset
+            self._index_mapped = True
+            self._set_tombstones(tombstones)
+            self.documents_loaded = documents_loaded
+            self._document_index = {}
+            self._indexed_chunks = set()
+            self._close_registry()
+            self._registry_file = registry_file
+            self._registry_pending = True
+            self._bump_index_version()
+    
+    def save_snapshot(self, base_dir: str):
+        """
+        Guarda una instantánea atómica del índice en base_dir.
+        
+        Cada instantánea se escribe en un directorio nuevo y solo se publica al
+        reemplazar el archivo CURRENT, así un fallo a mitad de escritura nunca
+        deja un índice corrupto. Sin documentos cargados se retira CURRENT.
+        
+        El estado se copia con el lock del índice y se escribe fuera de él, así
+        las consultas no esperan a la escritura. Escribir, publicar y limpiar se
+        hace con un lock de archivo, por si varios procesos guardan en base_dir:
+        solo se eliminan las instantáneas anteriores a la que nombra CURRENT.
+        """
+        base = Path(base_dir)
+        base.mkdir(parents=True, exist_ok=True)
+        current = base / "CURRENT"
+        state = self._capture_state()
+        
+        with file_lock(base / SNAPSHOT_LOCK_FILE):
+            if state is None:
+                current.unlink(missing_ok=True)
+            else:
+                name = f"snapshot-{time.time_ns()}"
+                self._write_state(base / name, state)
+                tmp = base / "CURRENT.tmp"
+                tmp.write_text(name, encoding="utf-8")
+                os.replace(tmp, current)
+            
+            # Eliminar instantáneas anteriores a la publicada (releída: otro proceso pudo publicar)
+            published = _snapshot_time(current.read_text(encoding="utf-8").strip()) if current.exists() else None
+            for old in base.glob("snapshot-*"):
+                created = _snapshot_time(old.name)
+                if created is not None and (published is None or created < published):
+                    shutil.rmtree(old, ignore_errors=True)
+    
+    def load_snapshot(self, base_dir: str) -> bool:
+        """Carga la última instantánea publicada en base_dir, si existe."""
+        base = Path(base_dir)
+        current = base / "CURRENT"
+        if not current.exists():
+            return False
+        # Con el lock de archivo: otro proceso no elimina la instantánea mientras se abre
+        with file_lock(base / SNAPSHOT_LOCK_FILE):
+            if not current.exists():
+                return False
+            self.load_vector_store(str(base / current.read_text(encoding="utf-8").strip()))
+        return True
     
     def reset(self):
         """Reinicia el sistema RAG."""
-        self.vector_store = None
-        self.documents_loaded = []
+        with self._index_lock:
+            self.vector_store = None
+            self.documents_loaded = []
+            self.sparse_index = BM25Index()
+            self._distance_offset = 0.0
+            self._document_index = {}
+            self._indexed_chunks = set()
+            self._close_registry()
+            self._registry_pending = False
+            self._index_mapped = False
+            self._set_tombstones(set())
+            self._bump_index_version()
@@ -0,0 +1,341 @@
+import copy
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Palabras vacías del español, ya sin tildes (se comparan tras fold_accents)
+STOPWORDS = {
+    'a', 'al', 'ante', 'bajo', 'como', 'con', 'cual', 'cuales', 'cuando', 'de', 'del', 'desde', 'donde',
+    'durante', 'e', 'el', 'ella', 'ellas', 'ellos', 'en', 'entre', 'es', 'esa', 'esas', 'ese', 'eso',
+    'esos', 'esta', 'estas', 'este', 'esto', 'estos', 'fue', 'ha', 'han', 'hasta', 'la', 'las', 'le',
+    'les', 'lo', 'los', 'mas', 'mediante', 'mismo', 'muy', 'ni', 'no', 'o', 'otra', 'otras', 'otro',
+    'otros', 'para', 'pero', 'por', 'que', 'quien', 'se', 'segun', 'ser', 'si', 'sin', 'sobre', 'son',
+    'su', 'sus', 'tambien', 'tiene', 'u', 'un', 'una', 'unas', 'uno', 'unos', 'y', 'ya'
+}
+
+# Formato en disco del índice (arreglos numpy que se abren con memory-map):
+#   meta.json       k1, b y suma de las longitudes de los chunks
+#   terms.npy       términos en UTF-8, ordenados
+#   offsets.npy     int64[t + 1], inicio de las postings de cada término
+#   postings.npy    int32[p, 2], (fila del chunk, frecuencia) agrupadas por término
+#   lengths.npy     int32, tokens de cada chunk
+#   ids.npy         ids de los chunks de ancho fijo; ids_order.npy los ordena
+META_FILE = "meta.json"
+TERMS_FILE = "terms.npy"
+OFFSETS_FILE = "offsets.npy"
+POSTINGS_FILE = "postings.npy"
+LENGTHS_FILE = "lengths.npy"
+IDS_FILE = "ids.npy"
+IDS_ORDER_FILE = "ids_order.npy"
+
+# Postings añadidas que se acumulan en listas de Python antes de pasarlas a los arreglos
+PENDING_POSTINGS = 1 << 16
+
+_ACCENTS = str.maketrans("áéíóúüàèìòùâêîôû", "aeiouuaeiouaeiou")
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas sin tildes ni diéresis; conserva la ñ."""
+    return text.lower().translate(_ACCENTS)
+
+
+def _stem(token: str) -> str:
+    """Stemming ligero de plurales: requisitos → requisito, condiciones → condicion."""
+    if len(token) > 4 and token.endswith("es"):
+        token = token[:-2]
+    elif len(token) > 3 and token.endswith("s"):
+        token = token[:-1]
+    # nombre/nombres y parte/partes quedan en la misma raíz
+    if len(token) > 3 and token.endswith("e"):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados para el índice invertido; los números se conservan."""
+    return [_stem(token) for token in _TOKEN_RE.findall(fold_accents(text)) if token not in STOPWORDS]
+
+
+class _Buffer:
+    """
+    Arreglo numpy que crece por el final, duplicando su capacidad.
+
+    Empieza sobre un arreglo ajeno (por ejemplo en memory-map) y solo lo copia
+    al añadir filas. Las vistas ya entregadas no cambian con las filas nuevas.
+    """
+
+    __slots__ = ("_data", "_size", "_owned")
+
+    def __init__(self, data: np.ndarray):
+        self._data = data
+        self._size = len(data)
+        self._owned = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def view(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def extend(self, rows: np.ndarray):
+        end = self._size + len(rows)
+        if not self._owned or end > len(self._data):
+            data = np.empty((max(8, 2 * end),) + self._data.shape[1:], dtype=self._data.dtype)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+            self._owned = True
+        self._data[self._size:end] = rows
+        self._size = end
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 incremental sobre los chunks del vector store.
+
+    Las postings de cada término son un arreglo numpy de (fila, frecuencia):
+    la puntuación de una consulta se calcula vectorizada, sin recorrer las
+    postings en Python. Un índice cargado de disco queda en memory-map y cada
+    término se copia a memoria solo al recibir chunks nuevos. Los chunks
+    eliminados se marcan y desaparecen del disco en la siguiente save().
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # Índice guardado: términos ordenados y postings agrupadas por término
+        self._terms = np.zeros(0, dtype="S1")
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.zeros((0, 2), dtype=np.int32)
+        self._ids = np.zeros(0, dtype="S1")
+        self._ids_order = np.zeros(0, dtype=np.int64)
+        # Términos con chunks añadidos después de cargar y postings aún en listas
+        self._postings: Dict[str, _Buffer] = {}
+        self._pending: Dict[str, List[int]] = {}
+        self._pending_count = 0
+        # Longitud de cada fila e ids de las filas añadidas después de cargar
+        self._lengths = _Buffer(np.zeros(0, dtype=np.int32))
+        self._new_ids: List[str] = []
+        self._new_rows: Dict[str, int] = {}
+        self._deleted = set()
+        self._count = 0
+        self._total_len = 0
+        # Normalización por longitud y filas vigentes; se recalculan tras cada cambio
+        self._norms: Optional[np.ndarray] = None
+        self._live: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, doc_id: str, text: str):
+        """Indexa un chunk; los ids ya indexados se ignoran."""
+        if self._row(doc_id) is not None:
+            return
+        row = len(self._lengths)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._pending.setdefault(term, []).extend((row, tf))
+        self._pending_count += len(counts)
+
+        length = sum(counts.values())
+        self._lengths.extend(np.array([length], dtype=np.int32))
+        self._new_ids.append(doc_id)
+        self._new_rows[doc_id] = row
+        self._count += 1
+        self._total_len += length
+        self._changed()
+        if self._pending_count >= PENDING_POSTINGS:
+            self._flush()
+
+    def remove(self, doc_id: str):
+        """Elimina un chunk; sus postings se ignoran hasta la siguiente save()."""
+        row = self._row(doc_id)
+        if row is None:
+            return
+        self._deleted.add(row)
+        self._new_rows.pop(doc_id, None)
+        self._count -= 1
+        self._total_len -= int(self._lengths.view()[row])
+        self._changed()
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Los k chunks con mayor puntuación BM25 para la consulta, de mayor a menor."""
+        if not self._count or k <= 0:
+            return []
+        self._flush()
+        norms = self._length_norms()
+        live = self._live_rows()
+
+        scores = None
+        for term in set(tokenize(query)):
+            postings = self._term_postings(term)
+            if live is not None:
+                postings = postings[live[postings[:, 0]]]
+            df = len(postings)
+            if not df:
+                continue
+            idf = math.log(1 + (self._count - df + 0.5) / (df + 0.5))
+            rows = postings[:, 0]
+            tf = postings[:, 1].astype(np.float64)
+            if scores is None:
+                scores = np.zeros(len(norms))
+            # Cada fila aparece una sola vez en las postings de un término
+            scores[rows] += idf * (self.k1 + 1) * tf / (tf + norms[rows])
+        if scores is None:
+            return []
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        # De mayor a menor; a igual puntuación, en el orden en que se indexaron
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [(self._doc_id(row), float(scores[row])) for row in hits]
+
+    def _row(self, doc_id: str) -> Optional[int]:
+        """Fila vigente de un chunk o None si no está indexado."""
+        row = self._new_rows.get(doc_id)
+        if row is None and len(self._ids):
+            key = doc_id.encode("utf-8")
+            i = int(np.searchsorted(self._ids, key, sorter=self._ids_order))
+            if i < len(self._ids) and self._ids[self._ids_order[i]] == key:
+                row = int(self._ids_order[i])
+        return None if row is None or row in self._deleted else row
+
+    def _doc_id(self, row: int) -> str:
+        if row < len(self._ids):
+            return self._ids[row].decode("utf-8")
+        return self._new_ids[row - len(self._ids)]
+
+    def _saved_postings(self, term: str) -> np.ndarray:
+        """Postings de un término en el índice guardado (vacías si no aparece)."""
+        key = term.encode("utf-8")
+        i = int(np.searchsorted(self._terms, key))
+        if i < len(self._terms) and self._terms[i] == key:
+            return self._rows[self._offsets[i]:self._offsets[i + 1]]
+        return self._rows[:0]
+
+    def _term_postings(self, term: str) -> np.ndarray:
+        postings = self._postings.get(term)
+        return postings.view() if postings is not None else self._saved_postings(term)
+
+    def _flush(self):
+        """Pasa las postings pendientes a los arreglos de cada término."""
+        for term, pending in self._pending.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Buffer(self._saved_postings(term))
+            postings.extend(np.array(pending, dtype=np.int32).reshape(-1, 2))
+        self._pending.clear()
+        self._pending_count = 0
+
+    def _changed(self):
+        self._norms = None
+        self._live = None
+
+    def _length_norms(self) -> np.ndarray:
+        """k1·(1 - b + b·len/avg_len) de cada fila, calculado una vez por versión del índice."""
+        if self._norms is None:
+            avg_len = self._total_len / self._count or 1.0
+            self._norms = self.k1 * (1 - self.b + self.b * self._lengths.view() / avg_len)
+        return self._norms
+
+    def _live_rows(self) -> Optional[np.ndarray]:
+        """Máscara de filas no eliminadas, o None si no se eliminó ninguna."""
+        if not self._deleted:
+            return None
+        if self._live is None:
+            self._live = np.ones(len(self._lengths), dtype=bool)
+            self._live[list(self._deleted)] = False
+        return self._live
+
+    def clear(self):
+        self.__init__(self.k1, self.b)
+
+    def snapshot(self) -> "BM25Index":
+        """
+        Copia para guardar sin retener a quien escribe en el índice. Comparte
+        los arreglos: solo crecen por el final y las vistas copiadas no cambian.
+        """
+        self._flush()
+        frozen = copy.copy(self)
+        frozen._postings = {term: _Buffer(postings.view()) for term, postings in self._postings.items()}
+        frozen._pending = {}
+        frozen._lengths = _Buffer(self._lengths.view())
+        frozen._new_ids = list(self._new_ids)
+        frozen._new_rows = dict(self._new_rows)
+        frozen._deleted = set(self._deleted)
+        frozen._changed()
+        return frozen
+
+    def save(self, path: Union[str, Path]):
+        """Guarda el índice en el directorio path sin los chunks eliminados."""
+        self._flush()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        saved = {term: i for i, term in enumerate(self._terms.tolist())}
+        updated = {term.encode("utf-8"): postings.view() for term, postings in self._postings.items()}
+        terms = sorted(saved.keys() | updated.keys())
+        parts = []
+        for term in terms:
+            postings = updated.get(term)
+            if postings is None:
+                i = saved[term]
+                postings = self._rows[self._offsets[i]:self._offsets[i + 1]]
+            parts.append(postings)
+        counts = np.array([len(postings) for postings in parts], dtype=np.int64)
+        rows = np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.int32)
+
+        ids = np.concatenate([self._ids, np.array([doc_id.encode("utf-8") for doc_id in self._new_ids], dtype=np.bytes_)])
+        lengths = self._lengths.view()
+        live = self._live_rows()
+        if live is not None:
+            # Quitar las postings de los chunks eliminados y renumerar las filas
+            keep = live[rows[:, 0]]
+            counts = np.bincount(np.repeat(np.arange(len(terms)), counts)[keep], minlength=len(terms))
+            renumber = (np.cumsum(live) - 1).astype(np.int32)
+            rows = np.column_stack((renumber[rows[keep, 0]], rows[keep, 1]))
+            terms = [term for term, count in zip(terms, counts) if count]
+            counts = counts[counts > 0]
+            ids, lengths = ids[live], lengths[live]
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        np.save(path / TERMS_FILE, np.array(terms, dtype=np.bytes_) if terms else np.zeros(0, dtype="S1"))
+        np.save(path / OFFSETS_FILE, offsets)
+        np.save(path / POSTINGS_FILE, np.ascontiguousarray(rows, dtype=np.int32))
+        np.save(path / LENGTHS_FILE, np.asarray(lengths, dtype=np.int32))
+        np.save(path / IDS_FILE, ids)
+        np.save(path / IDS_ORDER_FILE, np.argsort(ids, kind="stable"))
+        with open(path / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "total_len": self._total_len}, f)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BM25Index":
+        """Abre un índice guardado con save() en memory-map; no lee las postings."""
+        path = Path(path)
+        with open(path / META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(meta["k1"], meta["b"])
+        index._terms = np.load(path / TERMS_FILE, mmap_mode="r")
+        index._offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        index._rows = np.load(path / POSTINGS_FILE, mmap_mode="r")
+        index._ids = np.load(path / IDS_FILE, mmap_mode="r")
+        index._ids_order = np.load(path / IDS_ORDER_FILE, mmap_mode="r")
+        index._lengths = _Buffer(np.load(path / LENGTHS_FILE, mmap_mode="r"))
+        index._count = len(index._ids)
+        index._total_len = meta["total_len"]
+        return index
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Tuple[str, str]]) -> "BM25Index":
+        """Construye el índice a partir de pares (id, texto)."""
+        index = cls()
+        for doc_id, text in documents:
+            index.add(doc_id, text)
+        return index
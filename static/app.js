@@ -4,6 +4,10 @@ const state = {
     documentsLoaded: false
 };
 
+// Consulta del avance de una carga: intervalo y tiempo máximo de espera
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_MAX_WAIT_MS = 30 * 60 * 1000;
+
 // Elementos del DOM
 const elements = {
     fileInput: document.getElementById('fileInput'),
@@ -131,7 +135,27 @@ async function uploadDocuments() {
         const data = await response.json();
         
         if (response.ok) {
-            showNotification(`✅ ${data.message}`, 'success');
+            // El servidor procesa la carga en segundo plano: consultar su avance
+            const job = await waitForJob(data.job_url);
+            
+            if (job.status === 'failed') {
+                showNotification(`❌ Error: ${job.error}`, 'error');
+                return;
+            }
+            
+            let message = `Se cargaron ${job.files.length} documento(s) exitosamente`;
+            const skipped = Object.keys(job.skipped || {}).length;
+            if (skipped > 0) {
+                message += ` (${skipped} omitido(s) por no tener cambios)`;
+            }
+            showNotification(`✅ ${message}`, 'success');
+            
+            // Archivos que no se pudieron procesar dentro de la misma carga
+            const failed = Object.entries(job.errors || {});
+            if (failed.length > 0) {
+                showNotification(`⚠️ ${failed.map(([name, error]) => `${name}: ${error}`).join(' | ')}`, 'error');
+            }
+            
             state.selectedFiles = [];
             updateFilesList();
             elements.uploadBtn.disabled = true;
@@ -153,6 +177,28 @@ async function uploadDocuments() {
     }
 }
 
+// Wait for a background upload job, showing its progress
+async function waitForJob(jobUrl) {
+    const deadline = Date.now() + JOB_MAX_WAIT_MS;
+    while (Date.now() < deadline) {
+        const response = await fetch(jobUrl);
+        const job = await response.json().catch(() => ({}));
+        
+        // Carga desconocida (p. ej. tras reiniciar el servidor) o error del servidor
+        if (!response.ok) {
+            return { status: 'failed', error: job.detail || `No se pudo consultar la carga (HTTP ${response.status})` };
+        }
+        
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+        
+        showLoading(`Procesando documentos... ${job.files_done}/${job.files_total} archivo(s), ${job.chunks_indexed} fragmento(s) indexado(s)`);
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+    return { status: 'failed', error: 'La carga sigue en proceso; consulte el estado más tarde' };
+}
+
 // Check system status
 async function checkSystemStatus() {
     try {
@@ -171,6 +217,11 @@ async function checkSystemStatus() {
             elements.statusDot.classList.remove('active');
             elements.questionInput.disabled = true;
             elements.sendBtn.disabled = true;
+            
+            // El servidor sigue cargando el índice guardado: volver a consultar
+            if (data.status === 'starting') {
+                setTimeout(checkSystemStatus, 1000);
+            }
         }
     } catch (error) {
         console.error('Error checking status:', error);
@@ -192,7 +243,8 @@ async function sendQuestion() {
     showLoading('Buscando respuesta...');
     
     try {
-        const response = await fetch('/api/query', {
+        // Respuesta en streaming: fuentes primero, luego cada fragmento a medida que llega
+        const response = await fetch('/api/query/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -200,13 +252,29 @@ async function sendQuestion() {
             body: JSON.stringify({ question })
         });
         
-        const data = await response.json();
-        
-        if (response.ok) {
-            addMessage(data.answer, 'assistant', data.sources, data.confidence);
-        } else {
+        if (!response.ok) {
+            const data = await response.json();
             addMessage(`Error: ${data.detail}`, 'assistant');
+            return;
         }
+        
+        let message = null;
+        let answer = '';
+        await readEventStream(response, (event) => {
+            if (!message) {
+                hideLoading();
+                message = addMessage('', 'assistant');
+            }
+            if (event.event === 'sources') {
+                setMessageSources(message, event.sources, event.confidence);
+            } else if (event.event === 'fragment') {
+                answer += event.text;
+                setMessageText(message, answer);
+            } else if (event.event === 'error') {
+                answer += `${answer ? '\n\n' : ''}Error: ${event.detail}`;
+                setMessageText(message, answer);
+            }
+        });
     } catch (error) {
         addMessage('Error de conexión con el servidor', 'assistant');
         console.error('Error:', error);
@@ -218,20 +286,44 @@ async function sendQuestion() {
     }
 }
 
-// Add message to chat
-function addMessage(text, sender, sources = null, confidence = null) {
-    const messageDiv = document.createElement('div');
-    messageDiv.className = `message message-${sender}`;
+// Lee una respuesta NDJSON y llama a onEvent con cada objeto a medida que llega
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
     
-    // Convertir markdown básico a HTML
-    let formattedText = text
+    while (true) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+        
+        if (done) break;
+    }
+    if (buffer.trim()) {
+        onEvent(JSON.parse(buffer));
+    }
+}
+
+// Convertir markdown básico a HTML
+function formatMessageText(text) {
+    const formattedText = text
         .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')  // Bold
         .replace(/---/g, '<hr style="margin: 10px 0; border: none; border-top: 1px solid #e0e0e0;">')  // Separadores
         .replace(/\n\n/g, '</p><p>')  // Párrafos
         .replace(/\n/g, '<br>');  // Saltos de línea
     
-    formattedText = `<p>${formattedText}</p>`;
-    
+    return `<p>${formattedText}</p>`;
+}
+
+function setMessageText(messageDiv, text) {
+    messageDiv.querySelector('.message-bubble').innerHTML = formatMessageText(text);
+    elements.chatMessages.scrollTop = elements.chatMessages.scrollHeight;
+}
+
+function setMessageSources(messageDiv, sources, confidence) {
     let sourcesHTML = '';
     if (sources && sources.length > 0) {
         sourcesHTML = `
@@ -252,14 +344,23 @@ function addMessage(text, sender, sources = null, confidence = null) {
             </div>
         `;
     }
-    
+    messageDiv.querySelector('.message-sources-container').innerHTML = sourcesHTML;
+    elements.chatMessages.scrollTop = elements.chatMessages.scrollHeight;
+}
+
+// Add message to chat
+function addMessage(text, sender, sources = null, confidence = null) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message message-${sender}`;
     messageDiv.innerHTML = `
-        <div class="message-bubble">${formattedText}</div>
-        ${sourcesHTML}
+        <div class="message-bubble"></div>
+        <div class="message-sources-container"></div>
     `;
     
     elements.chatMessages.appendChild(messageDiv);
-    elements.chatMessages.scrollTop = elements.chatMessages.scrollHeight;
+    setMessageText(messageDiv, text);
+    setMessageSources(messageDiv, sources, confidence);
+    return messageDiv;
 }
 
 // Reset system
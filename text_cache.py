@@ -0,0 +1,51 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+
+class PageTextCache:
+    """
+    Caché en disco del texto extraído de cada página, por hash de archivo.
+
+    Cada archivo tiene su directorio con un .txt por página y pages.json con
+    el número de páginas. Las escrituras son atómicas (archivo temporal y
+    os.replace): varios procesos pueden llenar páginas distintas del mismo
+    archivo y una extracción interrumpida solo deja páginas completas.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _file_dir(self, file_hash: str) -> Path:
+        return self.directory / file_hash[:2] / file_hash
+
+    def get(self, file_hash: str, page: int) -> Optional[str]:
+        """Texto de una página o None si aún no se extrajo."""
+        try:
+            with open(self._file_dir(file_hash) / f"{page:06d}.txt", encoding="utf-8", newline="") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, file_hash: str, page: int, text: str):
+        self._write(self._file_dir(file_hash) / f"{page:06d}.txt", text)
+
+    def page_count(self, file_hash: str) -> Optional[int]:
+        """Número de páginas del archivo, si ya se registró."""
+        try:
+            with open(self._file_dir(file_hash) / "pages.json", encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except FileNotFoundError:
+            return None
+
+    def set_page_count(self, file_hash: str, pages: int):
+        self._write(self._file_dir(file_hash) / "pages.json", json.dumps({"pages": pages}))
+
+    @staticmethod
+    def _write(path: Path, text: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp, path)
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List
+
+
+class PoolSaturatedError(RuntimeError):
+    """Se lanza cuando un pool ya tiene su cupo máximo de tareas en curso."""
+
+
+class BoundedExecutor:
+    """Envuelve un executor limitando las tareas pendientes en lugar de encolar sin fin."""
+
+    def __init__(self, executor: Executor, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._executor = executor
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._in_flight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        # Esperas de un cupo libre (ver slot_released)
+        self._waiters: List[Future] = []
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Envía una tarea al pool o lanza PoolSaturatedError si no hay cupo."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturatedError(f"El pool '{self.name}' está saturado, intente más tarde")
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Ejecuta una tarea en el pool sin bloquear el event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def slot_released(self) -> Future:
+        """
+        Future que se completa al liberarse un cupo, o ya completado si hay uno
+        libre. Permite esperar a que el pool deje de estar saturado sin sondear.
+        """
+        waiter = Future()
+        with self._lock:
+            if self._in_flight < self.max_pending:
+                waiter.set_result(None)
+            else:
+                self._waiters.append(waiter)
+        return waiter
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self._in_flight -= 1
+            waiters, self._waiters = self._waiters, []
+        self._slots.release()
+        for waiter in waiters:
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        """Ocupación actual del pool."""
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "rejected": self._rejected
+        }
+
+    def shutdown(self):
+        """Detiene el pool esperando las tareas en curso."""
+        self._executor.shutdown(wait=True)
+
+
+def create_thread_pool(name: str, max_workers: int, max_pending: int) -> BoundedExecutor:
+    """Pool de hilos para trabajo que libera el GIL (embeddings, FAISS)."""
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+    return BoundedExecutor(executor, name, max_workers, max_pending)
+
+
+def create_process_pool(name: str, max_workers: int, max_pending: int) -> BoundedExecutor:
+    """Pool de procesos para trabajo de CPU en Python puro (extracción de texto)."""
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    return BoundedExecutor(executor, name, max_workers, max_pending)